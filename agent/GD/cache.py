@@ -0,0 +1,209 @@
+import os
+import shutil
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import Callable
+
+from agent.constants import CACHE_MAX_BYTES, CACHE_TTL, LOG_LEVEL
+
+# Stubs of native Google Sheets are cached files too.
+EXCEL_SUFFIXES = (".xlsx", ".xls", ".gsheet")
+# Files which are not cached copies of Drive files.
+SKIPPED_SUFFIXES = (".json", ".tmp", ".part")
+
+logger = getLogger("google_drive")
+logger.setLevel(LOG_LEVEL)
+
+
+def owner_stem(path: Path) -> str:
+    """Stem of the excel file which the cache entry belongs to."""
+    if path.suffix == ".sidecar":
+        # Sidecar directory is named `{stem}.{revision}.sidecar`.
+        return path.name.removesuffix(".sidecar").rsplit(".", 1)[0]
+    return path.stem
+
+
+def _size(path: Path) -> int:
+    """Size of the file or of all files in the directory."""
+    if path.is_dir():
+        return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+    return path.stat().st_size
+
+
+class FileCache:
+    """
+    Size and age bounded directory of downloaded files.
+
+    Every cached excel file with its sidecars is one entry. Entries are
+    evicted least recently used first, when the total size exceeds
+    CACHE_MAX_BYTES, and when they were not used for CACHE_TTL seconds.
+    Files opened by readers are never evicted. Last use is stored as the
+    access time of the excel file, so the index is rebuilt by scanning the
+    directory after restart.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = CACHE_MAX_BYTES, ttl: int = CACHE_TTL):
+        """
+        Initialize FileCache.
+
+        Args:
+            directory (Path): cache directory.
+            max_bytes (int, optional): size quota in bytes, 0 disables it. Defaults to CACHE_MAX_BYTES.
+            ttl (int, optional): max time in seconds since the last use, 0 disables it. Defaults to CACHE_TTL.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.scan()
+
+    def scan(self) -> None:
+        """Rebuilds the index from the cache directory."""
+        entries = {}
+        try:
+            paths = list(self.directory.iterdir())
+        except FileNotFoundError:
+            paths = []
+        for path in paths:
+            if path.suffix in SKIPPED_SUFFIXES:
+                continue
+            try:
+                size = _size(path)
+                stat = path.stat()
+            except OSError:
+                # Removed while the directory was scanned.
+                continue
+            entry = entries.setdefault(
+                owner_stem(path), {"files": [], "size": 0, "used": 0.0}
+            )
+            entry["size"] += size
+            if path.suffix in EXCEL_SUFFIXES:
+                if not entry["files"]:
+                    entry["used"] = 0.0
+                entry["files"].append(path)
+                entry["used"] = max(entry["used"], stat.st_atime)
+            elif not entry["files"]:
+                # Sidecars without excel file are used no later than they were written.
+                entry["used"] = max(entry["used"], stat.st_mtime)
+        with self._lock:
+            self._entries = entries
+
+    def touch(self, file_path: Path) -> None:
+        """
+        Marks the cached file as used now.
+
+        Args:
+            file_path (Path): path to cached excel file.
+        """
+        now = time.time()
+        try:
+            # Modification time is kept, it orders revisions of the file.
+            os.utime(file_path, (now, Path(file_path).stat().st_mtime))
+        except OSError as exc:
+            logger.warning("Use of %s is not stored: %s", file_path, exc)
+        with self._lock:
+            entry = self._entries.get(Path(file_path).stem)
+            if entry is not None:
+                entry["used"] = now
+
+    def files(self, file_id: str) -> list[Path]:
+        """
+        Get cached excel files of all revisions of the file.
+
+        Args:
+            file_id (str): file id on Google Drive.
+
+        Returns:
+            list[Path]: paths to cached files.
+        """
+        return [
+            path
+            for path in self.directory.glob(f"{file_id}.*")
+            if path.is_file() and path.suffix in EXCEL_SUFFIXES and path.stem.split(".")[0] == file_id
+        ]
+
+    def remove(self, stem: str) -> int:
+        """
+        Removes the cached excel file and its sidecars.
+
+        Args:
+            stem (str): stem of the excel file.
+
+        Returns:
+            int: count of removed bytes.
+        """
+        removed = 0
+        for path in self.directory.glob(f"{stem}.*"):
+            if path.suffix in SKIPPED_SUFFIXES or owner_stem(path) != stem:
+                continue
+            try:
+                size = _size(path)
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+            except OSError as exc:
+                logger.warning("Cached %s is not removed: %s", path, exc)
+                continue
+            removed += size
+        with self._lock:
+            self._entries.pop(stem, None)
+        return removed
+
+    def collect(self, in_use: Callable[[Path], bool] = None, keep: Path = None) -> int:
+        """
+        Evicts expired entries and least recently used entries over the quota.
+
+        Sizes are taken by a new scan, sidecars grow after the file is downloaded.
+
+        Args:
+            in_use (Callable[[Path], bool], optional): checks if the cached file is
+                opened by a reader, such files are not evicted.
+            keep (Path, optional): file which is not evicted, e.g. just downloaded.
+
+        Returns:
+            int: count of evicted entries.
+        """
+        self.scan()
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1]["used"])
+        total = sum(entry["size"] for _, entry in entries)
+        expired_before = time.time() - self.ttl
+        evicted = 0
+        for stem, entry in entries:
+            expired = self.ttl and entry["used"] < expired_before
+            if not expired and not (self.max_bytes and total > self.max_bytes):
+                # Entries are ordered by last use, the rest are newer.
+                break
+            if any(
+                file_path == keep or (in_use and in_use(file_path)) for file_path in entry["files"]
+            ):
+                continue
+            self.evicted_bytes += self.remove(stem)
+            total -= entry["size"]
+            evicted += 1
+        self.evicted += evicted
+        if evicted:
+            logger.debug("%d cache entries are evicted, %d bytes are left", evicted, total)
+        return evicted
+
+    def stats(self) -> dict:
+        """
+        Get cache counters.
+
+        Returns:
+            dict: counters with keys: entries, size, evicted, evicted_bytes.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "entries": len(entries),
+            "size": sum(entry["size"] for entry in entries),
+            "evicted": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+        }
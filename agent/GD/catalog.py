@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import time
+from logging import getLogger
+from pathlib import Path
+
+import httpx
+
+from agent.constants import CATALOG_MAX_STALENESS, CATALOG_REFRESH_SECONDS, LOG_LEVEL
+from agent.GD.client import DriveClient
+
+SPREADSHEET_MIME_TYPES = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.ms-excel",
+    "application/vnd.google-apps.spreadsheet",
+)
+FILES_QUERY = "({}) and trashed=false".format(
+    " or ".join(f"mimeType='{mime_type}'" for mime_type in SPREADSHEET_MIME_TYPES)
+)
+PAGE_SIZE = 1000
+
+logger = getLogger("google_drive")
+logger.setLevel(LOG_LEVEL)
+
+
+class Catalog:
+    """
+    Local index of spreadsheets on Google Drive.
+
+    The index is seeded once by the full paginated listing and then kept
+    current by the Drive changes feed. It is stored to a file with the
+    changes page token, so restarts continue from the last change. Listing
+    is a local lookup; a background task applies changes every
+    CATALOG_REFRESH_SECONDS, and the listing itself refreshes the index
+    older than CATALOG_MAX_STALENESS.
+    """
+
+    def __init__(self, client: DriveClient, file_path: Path):
+        """
+        Initialize Catalog.
+
+        Args:
+            client (DriveClient): Google Drive client.
+            file_path (Path): path to the file with stored index.
+        """
+        self.client = client
+        self.file_path = Path(file_path)
+        self.full_listings = 0
+        self.refreshes = 0
+        self._files = None
+        self._page_token = None
+        self._updated = 0.0
+        self._update_lock = None
+        self._refresher = None
+        self._load()
+
+    async def list_files(self) -> list[dict]:
+        """
+        Get spreadsheets from the index.
+
+        Returns:
+            list[dict]: List of dicts with files info im format `{"id: file_id, "name": file_name}`
+
+        Raises:
+            httpx.HTTPError: if the index is not built and Google Drive is not available.
+        """
+        self._start_refresher()
+        if self._files is None or time.time() - self._updated > CATALOG_MAX_STALENESS:
+            await self.refresh()
+        return [{"id": file_id, "name": name} for file_id, name in self._files.items()]
+
+    async def seed(self) -> None:
+        """Builds the index by the full listing of spreadsheets."""
+        async with self._get_update_lock():
+            await self._seed()
+
+    async def _seed(self) -> None:
+        """Builds the index, the update lock must be held."""
+        # The token is taken before listing, so changes made during listing are not lost.
+        page_token = (await self.client.get_json("/drive/v3/changes/startPageToken"))[
+            "startPageToken"
+        ]
+        files = {}
+        request_token = None
+        while True:
+            results = await self.client.get_json(
+                "/drive/v3/files",
+                q=FILES_QUERY,
+                spaces="drive",
+                fields="nextPageToken, files(id, name)",
+                pageSize=PAGE_SIZE,
+                pageToken=request_token,
+            )
+            files.update((file["id"], file["name"]) for file in results.get("files", []))
+            request_token = results.get("nextPageToken")
+            if not request_token:
+                break
+        self._files = files
+        self._page_token = page_token
+        self._updated = time.time()
+        self.full_listings += 1
+        self._save()
+        logger.debug("Catalog is seeded with %d files", len(files))
+
+    async def refresh(self) -> None:
+        """Applies changes made on Google Drive since the last refresh."""
+        async with self._get_update_lock():
+            if self._files is None:
+                await self._seed()
+                return
+            page_token = self._page_token
+            changes = []
+            try:
+                while True:
+                    results = await self.client.get_json(
+                        "/drive/v3/changes",
+                        pageToken=page_token,
+                        spaces="drive",
+                        includeRemoved="true",
+                        pageSize=PAGE_SIZE,
+                        fields=(
+                            "nextPageToken, newStartPageToken, "
+                            "changes(fileId, removed, file(name, mimeType, trashed))"
+                        ),
+                    )
+                    changes.extend(results.get("changes", []))
+                    page_token = results.get("nextPageToken")
+                    if not page_token:
+                        page_token = results["newStartPageToken"]
+                        break
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code not in (400, 404, 410):
+                    raise
+                # Expired or invalid page token, the index is built again.
+                logger.warning("Changes page token is not valid, catalog is seeded again: %s", exc)
+                await self._seed()
+                return
+            # Changes are applied at once, so listing never sees a half applied page.
+            for change in changes:
+                self._apply(change)
+            self._page_token = page_token
+            self._updated = time.time()
+            self.refreshes += 1
+            if changes:
+                self._save()
+                logger.debug("Catalog is refreshed with %d changes", len(changes))
+
+    def _apply(self, change: dict) -> None:
+        """Applies one change of the changes feed to the index."""
+        file = change.get("file") or {}
+        if (
+            change.get("removed")
+            or file.get("trashed")
+            or file.get("mimeType") not in SPREADSHEET_MIME_TYPES
+        ):
+            self._files.pop(change["fileId"], None)
+        else:
+            self._files[change["fileId"]] = file["name"]
+
+    def _get_update_lock(self) -> asyncio.Lock:
+        """Lock which serializes updates of the index."""
+        if self._update_lock is None:
+            self._update_lock = asyncio.Lock()
+        return self._update_lock
+
+    def _start_refresher(self) -> None:
+        """Starts background refresh task if it is not running."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        """Refreshes the index every CATALOG_REFRESH_SECONDS."""
+        while True:
+            await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except httpx.HTTPError as exc:
+                logger.warning("Catalog refresh failed: %s", exc)
+
+    def _load(self) -> None:
+        """Loads the index stored before."""
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._files = data["files"]
+            self._page_token = data["page_token"]
+            self._updated = data["updated"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self._files = None
+
+    def _save(self) -> None:
+        """Atomically stores the index."""
+        tmp_path = self.file_path.with_name(f"{self.file_path.name}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"files": self._files, "page_token": self._page_token, "updated": self._updated},
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, self.file_path)
+        except OSError as exc:
+            logger.warning("Catalog is not saved: %s", exc)
+
+    def stats(self) -> dict:
+        """
+        Get catalog counters.
+
+        Returns:
+            dict: counters with keys: files, age, full_listings, refreshes.
+        """
+        return {
+            "files": len(self._files or {}),
+            "age": time.time() - self._updated if self._files is not None else None,
+            "full_listings": self.full_listings,
+            "refreshes": self.refreshes,
+        }
@@ -0,0 +1,191 @@
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+from logging import getLogger
+from typing import AsyncIterator, Callable
+
+import httpx
+from google.auth.transport.requests import Request
+
+from agent.constants import (
+    DRIVE_API_ENDPOINT,
+    DRIVE_DOWNLOAD_RETRIES,
+    DRIVE_MAX_CONNECTIONS,
+    LOG_LEVEL,
+)
+
+DEFAULT_API_ENDPOINT = "https://www.googleapis.com"
+REQUEST_TIMEOUT = httpx.Timeout(60, connect=10)
+MAX_RETRY_DELAY = 30
+# Token is refreshed in background this count of seconds before it expires.
+TOKEN_REFRESH_MARGIN = 300
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+logger = getLogger("google_drive")
+logger.setLevel(LOG_LEVEL)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Checks if the request failed by a temporary problem and may be repeated."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+async def backoff(attempt: int) -> None:
+    """Waits before the next attempt of the failed request."""
+    await asyncio.sleep(min(2**attempt, MAX_RETRY_DELAY))
+
+
+class DriveClient:
+    """
+    Asynchronous client of Google Drive REST API.
+
+    All requests share one pooled keep-alive httpx client. Access token is
+    refreshed in background before it expires, and on demand when it is
+    expired or the API rejects it; concurrent requests wait for one refresh.
+    Nothing is sent over network until the first request or `start`.
+    """
+
+    def __init__(self, credentials, api_endpoint: str = None, on_refresh: Callable = None):
+        """
+        Initialize DriveClient.
+
+        Args:
+            credentials (google.auth.credentials.Credentials): credentials for requests.
+            api_endpoint (str, optional): API address. Defaults to DRIVE_API_ENDPOINT or Google API.
+            on_refresh (Callable, optional): function without arguments called after token refresh.
+        """
+        self.credentials = credentials
+        self.api_endpoint = (api_endpoint or DRIVE_API_ENDPOINT or DEFAULT_API_ENDPOINT).rstrip("/")
+        self.token_refreshes = 0
+        self._on_refresh = on_refresh
+        self._client = None
+        self._loop = None
+        self._refresh_lock = None
+        self._refresher = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get httpx client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Connections are bound to the loop which opened them.
+            self._client = httpx.AsyncClient(
+                base_url=self.api_endpoint,
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=DRIVE_MAX_CONNECTIONS,
+                    max_keepalive_connections=DRIVE_MAX_CONNECTIONS,
+                ),
+            )
+            self._loop = loop
+            self._refresh_lock = asyncio.Lock()
+            self._refresher = loop.create_task(self._refresh_loop())
+        return self._client
+
+    def start(self) -> None:
+        """Opens the client in the running event loop and starts background token refresh."""
+        self._get_client()
+
+    async def _refresh(self, token: str = None) -> None:
+        """Refreshes the token unless other request refreshed it after `token` was read."""
+        async with self._refresh_lock:
+            if self.credentials.token == token or not self.credentials.valid:
+                await asyncio.to_thread(self.credentials.refresh, Request())
+                self.token_refreshes += 1
+                if self._on_refresh:
+                    self._on_refresh()
+
+    async def _refresh_loop(self) -> None:
+        """Refreshes the token before it expires."""
+        while True:
+            if self.credentials.valid and self.credentials.expiry is None:
+                # Credentials without expiration, e.g. anonymous.
+                return
+            if self.credentials.token:
+                # Expiry of google credentials is a naive UTC datetime.
+                now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+                delay = (self.credentials.expiry - now).total_seconds() - TOKEN_REFRESH_MARGIN
+                await asyncio.sleep(max(delay, 0))
+            try:
+                await self._refresh(self.credentials.token)
+            except Exception as exc:
+                logger.warning("Background token refresh failed: %s", exc)
+                await backoff(MAX_RETRY_DELAY)
+
+    async def _auth_headers(self, force_refresh: bool = False) -> dict:
+        """Makes authorization headers, the token is refreshed if needed."""
+        if force_refresh or not self.credentials.valid:
+            await self._refresh(self.credentials.token)
+        headers = {}
+        self.credentials.apply(headers)
+        return headers
+
+    @asynccontextmanager
+    async def stream(
+        self, path: str, params: dict = None, headers: dict = None
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Sends GET request and streams the response body.
+
+        Args:
+            path (str): API path, e.g. `/drive/v3/files`.
+            params (dict, optional): query parameters.
+            headers (dict, optional): additional headers.
+
+        Yields:
+            httpx.Response: response with not read body.
+
+        Raises:
+            httpx.HTTPError: if the request failed.
+        """
+        client = self._get_client()
+        for force_refresh in (False, True):
+            auth_headers = await self._auth_headers(force_refresh)
+            async with client.stream(
+                "GET", path, params=params, headers={**auth_headers, **(headers or {})}
+            ) as response:
+                if response.status_code == 401 and not force_refresh:
+                    continue
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                yield response
+                return
+
+    async def get_json(self, path: str, **params) -> dict:
+        """
+        Sends GET request, temporary failures are retried.
+
+        Args:
+            path (str): API path, e.g. `/drive/v3/files`.
+            **params: query parameters, None values are skipped.
+
+        Returns:
+            dict: response JSON.
+
+        Raises:
+            httpx.HTTPError: if the request failed.
+        """
+        params = {key: value for key, value in params.items() if value is not None}
+        attempt = 0
+        while True:
+            try:
+                async with self.stream(path, params) as response:
+                    await response.aread()
+                    return response.json()
+            except httpx.HTTPError as exc:
+                attempt += 1
+                if attempt > DRIVE_DOWNLOAD_RETRIES or not is_retryable(exc):
+                    raise
+                logger.warning("Request %s failed, retry %d: %s", path, attempt, exc)
+                await backoff(attempt)
+
+    async def aclose(self) -> None:
+        """Closes pooled connections."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,15 +1,63 @@
+import asyncio
+import hashlib
 import json
+import os
+import tempfile
+from logging import getLogger
 from pathlib import Path
+from typing import Callable
 
+import httpx
 from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 
-from agent.constants import AUTH_DATA_DIR, CACHE_DIR, GD_CREDENTIALS_FILE
+from agent.constants import (
+    AUTH_DATA_DIR,
+    CACHE_COLLECT_SECONDS,
+    CACHE_DIR,
+    DRIVE_DOWNLOAD_CHUNK_SIZE,
+    DRIVE_DOWNLOAD_RETRIES,
+    DRIVE_PARALLEL_PARTS,
+    DRIVE_PARALLEL_THRESHOLD,
+    GD_CREDENTIALS_FILE,
+    LOG_LEVEL,
+)
 from agent.exceptions import GoogleDriveAuthError, GoogleDriveError
 from agent.GD import SCOPES
+from agent.GD.cache import FileCache
+from agent.GD.catalog import Catalog
+from agent.GD.client import DriveClient, backoff, is_retryable
+from agent.GD.sheets import SheetValues
+
+METADATA_FIELDS = "id, name, mimeType, size, headRevisionId, md5Checksum, modifiedTime"
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+# Native Google Sheets are cached as stubs, their cells are read by ranges.
+SHEETS_STUB_SUFFIX = ".gsheet"
+
+logger = getLogger("google_drive")
+logger.setLevel(LOG_LEVEL)
+
+
+def revision_key(metadata: dict) -> str:
+    """
+    Makes short key of the file revision for cache file names.
+
+    Binary files have head revision id and md5 checksum, native Google Sheets
+    have only modification time.
+
+    Args:
+        metadata (dict): file metadata from Google Drive.
+
+    Returns:
+        str: revision key.
+    """
+    revision = (
+        metadata.get("headRevisionId")
+        or metadata.get("md5Checksum")
+        or metadata.get("modifiedTime", "")
+    )
+    return hashlib.md5(revision.encode()).hexdigest()[:12]
 
 
 class GDRequestor:
@@ -28,14 +76,26 @@ class GDRequestor:
         if not hasattr(self, "_initialized"):
             self._initialized = True
             self._creds = None
+            self.cache_hits = 0
+            self.downloads = 0
+            self.redownloads = 0
+            self.stale_reads = 0
+            self.collected = 0
             try:
                 with open(GD_CREDENTIALS_FILE, "r", encoding="utf-8") as f:
                     info = json.load(f)
                 if "installed" in info:
                     self._auth(use_cache=True)
+                    on_refresh = self._save_token
                 else:
                     self._auth_from_service_account()
-                self._service = build("drive", "v3", credentials=self._creds)
+                    on_refresh = None
+                self._client = DriveClient(self._creds, on_refresh=on_refresh)
+                self._catalog = Catalog(self._client, CACHE_DIR / "catalog.json")
+                self._downloads = {}
+                self._cache = FileCache(CACHE_DIR)
+                self._sheets = SheetValues(self._client)
+                self._collector = None
             except FileNotFoundError as exc:
                 raise GoogleDriveAuthError(
                     f"Credentials file not found by path {GD_CREDENTIALS_FILE}"
@@ -49,6 +109,9 @@ class GDRequestor:
         """
         Makes connection with Google drive with credentials file.
 
+        Expired cached token is not a reason for interactive authentication, it
+        is refreshed by the Drive client with the refresh token.
+
         Args:
             use_cache (bool): If True it will be use cached token after interactive authentication.
         """
@@ -56,13 +119,20 @@ class GDRequestor:
             self._creds = Credentials.from_authorized_user_file(
                 AUTH_DATA_DIR / "token.json", SCOPES
             )
-        if not self._creds or not self._creds.valid:
+        if not self._creds or not (self._creds.valid or self._creds.refresh_token):
+            # Flow is imported only when it is needed, its import is slow.
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
             flow = InstalledAppFlow.from_client_secrets_file(
                 GD_CREDENTIALS_FILE, SCOPES
             )
             self._creds = flow.run_local_server(port=0, timeout_seconds=20)
-            with open(AUTH_DATA_DIR / "token.json", "w", encoding="utf-8") as token:
-                token.write(self._creds.to_json())
+            self._save_token()
+
+    def _save_token(self) -> None:
+        """Saves user token to use it after restart."""
+        with open(AUTH_DATA_DIR / "token.json", "w", encoding="utf-8") as token:
+            token.write(self._creds.to_json())
 
     def _auth_from_service_account(self) -> None:
         """
@@ -72,87 +142,318 @@ class GDRequestor:
             GD_CREDENTIALS_FILE, scopes=SCOPES
         )
 
-    def list_files(self) -> list[dict]:
+    def start(self, in_use: Callable[[Path], bool] = None) -> None:
+        """
+        Starts background refresh of credentials, so requests don't wait for it,
+        and background eviction of the files cache.
+
+        Args:
+            in_use (Callable[[Path], bool], optional): checks if the cached file is
+                opened by a reader, such files are not evicted.
+        """
+        self._client.start()
+        if self._collector is None or self._collector.done():
+            self._collector = asyncio.create_task(self._collect_loop(in_use))
+
+    async def list_files(self) -> list[dict]:
         """
         Search a excel files on the Google Drive.
 
+        Files are taken from the local catalog, see `Catalog`.
+
         Returns:
             list[dict]: List of dicts with files info im format `{"id: file_id, "name": file_name}`
 
         Raises:
             GoogleDriveError: if problem with google drive connection.
         """
-        query = (
-            "mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' or "
-            "mimeType='application/vnd.ms-excel' or mimeType='application/vnd.google-apps.spreadsheet'"
-        )
         try:
-            results = (
-                self._service.files()
-                .list(
-                    q=query,
-                    spaces="drive",
-                    fields="files(id, name)",
-                    pageSize=1000,
-                )
-                .execute()
-            )
-            files = results.get("files", [])
-            return files
+            return await self._catalog.list_files()
         except Exception as exc:
             raise GoogleDriveError(str(exc)) from exc
 
-    def download_file(self, file_id: str) -> Path:
+    async def download_file(
+        self, file_id: str, in_use: Callable[[Path], bool] = None, export: bool = False
+    ) -> Path:
         """
         Downloads an excel file from Google drive and save it to cache.
 
+        Native Google Sheets are not exported unless it is asked, a stub file
+        with the sheets list is saved instead, and cells are read by ranges
+        with `get_values`.
+
+        Cached files are keyed by file revision, so the file is downloaded again
+        only if it was changed. Cached copies of older revisions are removed,
+        after a download the cache is shrunk to its quota.
+        If Google Drive is not available, the latest cached copy is returned.
+        Concurrent downloads of the same file revision share one request.
+
         Args:
             file_id (str): file id on Google Drive.
+            in_use (Callable[[Path], bool], optional): checks if the cached file is
+                opened by a reader, such files are not removed.
+            export (bool, optional): if True, native Google Sheets are exported to xlsx.
 
         Returns:
-            Path: path to downloaded file.
+            Path: path to downloaded file or to the stub of native Google Sheets.
 
         Raises:
             GoogleDriveError: if problem with google drive connection.
         """
         try:
-            file_metadata = self._service.files().get(fileId=file_id).execute()
-            mime_type = file_metadata["mimeType"]
-
-            if mime_type == "application/vnd.google-apps.spreadsheet":
-                extension = ".xlsx"
-                export_mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            elif mime_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
-                extension = ".xlsx"
-            elif mime_type == "application/vnd.ms-excel":
-                extension = ".xls"
-            else:
-                extension = ".xlsx"
+            file_metadata = await self._client.get_json(
+                f"/drive/v3/files/{file_id}", fields=METADATA_FIELDS
+            )
+        except Exception as exc:
+            file_path = self._latest_cached(file_id)
+            if file_path is None:
+                raise GoogleDriveError(str(exc)) from exc
+            self.stale_reads += 1
+            logger.warning("Revision of %s is not checked, cached copy is used: %s", file_id, exc)
+            self._cache.touch(file_path)
+            return file_path
 
-            file_path = CACHE_DIR / f"{file_id}{extension}"
+        mime_type = file_metadata["mimeType"]
+        if mime_type == "application/vnd.ms-excel":
+            extension = ".xls"
+        elif mime_type == SPREADSHEET_MIME_TYPE and not export:
+            extension = SHEETS_STUB_SUFFIX
+        else:
+            extension = ".xlsx"
+        file_path = CACHE_DIR / f"{file_id}.{revision_key(file_metadata)}{extension}"
 
-            if file_path.exists():
-                return file_path
+        if file_path.exists():
+            self.cache_hits += 1
+            self._cache.touch(file_path)
+            return file_path
+        task = self._downloads.get(file_path)
+        if task is None:
+            if self._latest_cached(file_id) is not None:
+                self.redownloads += 1
+            self.downloads += 1
+            task = asyncio.ensure_future(self._download(file_metadata, file_path))
+            self._downloads[file_path] = task
+            task.add_done_callback(lambda _: self._downloads.pop(file_path, None))
+        try:
+            # Cancelled caller doesn't cancel the download awaited by other callers.
+            await asyncio.shield(task)
+        except GoogleDriveError:
+            raise
+        except Exception as exc:
+            raise GoogleDriveError(str(exc)) from exc
 
-            with open(file_path, "wb") as file:
-                if mime_type == "application/vnd.google-apps.spreadsheet":
-                    request = self._service.files().export_media(
-                        fileId=file_id, mimeType=export_mime_type
-                    )
-                else:
-                    request = self._service.files().get_media(fileId=file_id)
+        self._cache.touch(file_path)
+        self._collect_old_revisions(file_id, file_path, in_use)
+        await asyncio.to_thread(self._cache.collect, in_use, file_path)
+        return file_path
 
-                downloader = MediaIoBaseDownload(file, request)
-                done = False
-                while not done:
-                    _, done = downloader.next_chunk()
+    async def _download(self, file_metadata: dict, file_path: Path) -> None:
+        """Downloads the file to temporary file and moves it to the cache path."""
+        file_id = file_metadata["id"]
+        # The file appears in cache only after it is fully downloaded.
+        fd, tmp_path = tempfile.mkstemp(prefix=file_path.name, suffix=".part", dir=CACHE_DIR)
+        os.close(fd)
+        try:
+            if file_path.suffix == SHEETS_STUB_SUFFIX:
+                await self._save_stub(file_metadata, tmp_path)
+            elif file_metadata["mimeType"] == SPREADSHEET_MIME_TYPE:
+                # Exported files have no size and are not downloaded by ranges.
+                await self._download_stream(
+                    f"/drive/v3/files/{file_id}/export",
+                    {"mimeType": XLSX_MIME_TYPE},
+                    tmp_path,
+                )
+            elif "size" in file_metadata:
+                await self._download_ranges(file_id, tmp_path, int(file_metadata["size"]))
+            else:
+                await self._download_stream(
+                    f"/drive/v3/files/{file_id}", {"alt": "media"}, tmp_path
+                )
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
 
-            return file_path
+    async def _save_stub(self, file_metadata: dict, file_path: str) -> None:
+        """Saves stub of native Google Sheets with its revision and sheets list."""
+        sheets = await self._sheets.get_sheets(file_metadata["id"])
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "id": file_metadata["id"],
+                    "revision": revision_key(file_metadata),
+                    "sheets": sheets,
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    async def get_values(self, file_id: str, revision: str, ranges: list[str]) -> list[list[list]]:
+        """
+        Reads cell ranges of native Google Sheets, see `SheetValues.get`.
 
+        Args:
+            file_id (str): file id on Google Drive.
+            revision (str): revision key of the file from its stub.
+            ranges (list[str]): ranges in A1 notation with sheet names.
+
+        Returns:
+            list[list[list]]: rows of values of every range.
+
+        Raises:
+            GoogleDriveError: if problem with google drive connection.
+        """
+        try:
+            return await self._sheets.get(file_id, revision, ranges)
         except Exception as exc:
             raise GoogleDriveError(str(exc)) from exc
 
+    async def _download_stream(self, path: str, params: dict, file_path: str) -> None:
+        """
+        Downloads the file without ranges, failed download is started again.
+
+        Args:
+            path (str): API path of the file content.
+            params (dict): query parameters.
+            file_path (str): path to the file to write.
+        """
+        attempt = 0
+        while True:
+            try:
+                with open(file_path, "wb") as file:
+                    async with self._client.stream(path, params) as response:
+                        async for chunk in response.aiter_bytes(DRIVE_DOWNLOAD_CHUNK_SIZE):
+                            file.write(chunk)
+                return
+            except httpx.HTTPError as exc:
+                attempt += 1
+                if attempt > DRIVE_DOWNLOAD_RETRIES or not is_retryable(exc):
+                    raise
+                logger.warning("Download of %s failed, retry %d: %s", path, attempt, exc)
+                await backoff(attempt)
+
+    async def _download_ranges(self, file_id: str, file_path: str, size: int) -> None:
+        """
+        Downloads the binary file by byte ranges, big files are split to parallel parts.
+
+        If the server doesn't support range requests, the file is downloaded
+        by one stream.
+
+        Args:
+            file_id (str): file id on Google Drive.
+            file_path (str): path to the file to write.
+            size (int): file size.
+        """
+        with open(file_path, "wb") as file:
+            file.truncate(size)
+        parts = DRIVE_PARALLEL_PARTS if size >= DRIVE_PARALLEL_THRESHOLD else 1
+        part_size = -(-size // parts) if size else 1
+        downloaded = await asyncio.gather(
+            *(
+                self._download_range(file_id, file_path, start, min(start + part_size, size) - 1)
+                for start in range(0, size, part_size)
+            )
+        )
+        if not all(downloaded):
+            logger.warning("Range requests are not supported, %s is downloaded by one stream", file_id)
+            await self._download_stream(f"/drive/v3/files/{file_id}", {"alt": "media"}, file_path)
+
+    async def _download_range(self, file_id: str, file_path: str, start: int, end: int) -> bool:
+        """
+        Downloads the byte range of the file, after a failure the rest of the range is requested.
+
+        Args:
+            file_id (str): file id on Google Drive.
+            file_path (str): path to the file to write.
+            start (int): first byte of the range.
+            end (int): last byte of the range, inclusive.
+
+        Returns:
+            bool: False if the server answered without the range, nothing is written then.
+        """
+        offset = start
+        attempt = 0
+        with open(file_path, "r+b") as file:
+            while offset <= end:
+                try:
+                    async with self._client.stream(
+                        f"/drive/v3/files/{file_id}",
+                        {"alt": "media"},
+                        {"Range": f"bytes={offset}-{end}"},
+                    ) as response:
+                        if response.status_code != 206:
+                            # The whole file is sent, it is not read by every part.
+                            return False
+                        file.seek(offset)
+                        # Bytes are written as they come, chunks buffered by httpx would be
+                        # lost on a dropped connection and the range would be read again.
+                        async for chunk in response.aiter_bytes():
+                            chunk = chunk[: end - offset + 1]
+                            file.write(chunk)
+                            offset += len(chunk)
+                            attempt = 0
+                    if offset <= end:
+                        raise httpx.RemoteProtocolError(f"Connection closed at byte {offset}")
+                except httpx.HTTPError as exc:
+                    attempt += 1
+                    if attempt > DRIVE_DOWNLOAD_RETRIES or not is_retryable(exc):
+                        raise
+                    logger.warning(
+                        "Download of bytes %d-%d failed, retry %d: %s", offset, end, attempt, exc
+                    )
+                    await backoff(attempt)
+        return True
+
+    def _latest_cached(self, file_id: str) -> Path | None:
+        """Last downloaded cached copy of the file."""
+        files = self._cache.files(file_id)
+        return max(files, key=lambda path: path.stat().st_mtime) if files else None
+
+    def _collect_old_revisions(
+        self, file_id: str, file_path: Path, in_use: Callable[[Path], bool] = None
+    ) -> None:
+        """Removes cached copies of other revisions of the file with their sidecars."""
+        for path in self._cache.files(file_id):
+            # Stub and export of one revision share the stem.
+            if path.stem != file_path.stem and not (in_use and in_use(path)):
+                self._cache.remove(path.stem)
+                self.collected += 1
+
+    async def _collect_loop(self, in_use: Callable[[Path], bool] = None) -> None:
+        """Evicts expired cache entries every CACHE_COLLECT_SECONDS."""
+        while True:
+            try:
+                await asyncio.to_thread(self._cache.collect, in_use)
+            except OSError as exc:
+                logger.warning("Cache eviction failed: %s", exc)
+            await asyncio.sleep(CACHE_COLLECT_SECONDS)
+
+    def cache_stats(self) -> dict:
+        """
+        Get counters of the files cache.
+
+        Returns:
+            dict: counters with keys: cache_hits, downloads, redownloads, stale_reads, collected,
+            entries, size, evicted, evicted_bytes, sheet_ranges. redownloads - downloads of changed files,
+            stale_reads - cached copies used without revision check, collected - removed
+            copies of old revisions, evicted - entries removed by quota or age,
+            sheet_ranges - counters of native Google Sheets range reads.
+        """
+        return {
+            **self._cache.stats(),
+            "sheet_ranges": self._sheets.stats(),
+            "cache_hits": self.cache_hits,
+            "downloads": self.downloads,
+            "redownloads": self.redownloads,
+            "stale_reads": self.stale_reads,
+            "collected": self.collected,
+        }
+
 
 if __name__ == "__main__":
-    a = GDRequestor()
-    a.download_file(a.list_files()[0]["id"])
+
+    async def main():
+        a = GDRequestor()
+        await a.download_file((await a.list_files())[0]["id"])
+
+    asyncio.run(main())
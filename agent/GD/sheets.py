@@ -0,0 +1,146 @@
+import threading
+from collections import OrderedDict
+from logging import getLogger
+
+from agent.constants import LOG_LEVEL, SHEETS_API_ENDPOINT, SHEETS_RANGE_CACHE_SIZE
+from agent.GD.client import DriveClient
+
+DEFAULT_API_ENDPOINT = "https://sheets.googleapis.com"
+SHEET_FIELDS = "sheets.properties(title,gridProperties(rowCount,columnCount))"
+
+logger = getLogger("google_drive")
+logger.setLevel(LOG_LEVEL)
+
+
+def sheet_range(sheet_name: str, a1_range: str = None) -> str:
+    """
+    Makes A1 notation of the range on the sheet.
+
+    Args:
+        sheet_name (str): sheet name.
+        a1_range (str, optional): range on the sheet, e.g. `A1:C3`. None means the whole sheet.
+
+    Returns:
+        str: range with quoted sheet name.
+    """
+    quoted = "'{}'".format(sheet_name.replace("'", "''"))
+    return f"{quoted}!{a1_range}" if a1_range else quoted
+
+
+class SheetValues:
+    """
+    Reads cell ranges of native Google Sheets by Sheets API.
+
+    Values of every range are cached by file revision, so repeated reads of
+    the same cells don't go to network. Ranges missing in the cache are
+    fetched by one batchGet request. The cache is bounded by count of ranges,
+    the least recently used ranges are dropped.
+    """
+
+    def __init__(
+        self,
+        client: DriveClient,
+        api_endpoint: str = None,
+        max_ranges: int = SHEETS_RANGE_CACHE_SIZE,
+    ):
+        """
+        Initialize SheetValues.
+
+        Args:
+            client (DriveClient): Google API client, its credentials are used for Sheets API.
+            api_endpoint (str, optional): Sheets API address. Defaults to SHEETS_API_ENDPOINT or Google API.
+            max_ranges (int, optional): max count of cached ranges. Defaults to SHEETS_RANGE_CACHE_SIZE.
+        """
+        self.client = client
+        self.api_endpoint = (api_endpoint or SHEETS_API_ENDPOINT or DEFAULT_API_ENDPOINT).rstrip("/")
+        self.max_ranges = max_ranges
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self._ranges = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_sheets(self, file_id: str) -> list[dict]:
+        """
+        Get sheets of the spreadsheet with their grid sizes.
+
+        Args:
+            file_id (str): file id on Google Drive.
+
+        Returns:
+            list[dict]: sheets in format `{"title": name, "row_count": rows, "column_count": columns}`.
+
+        Raises:
+            httpx.HTTPError: if the request failed.
+        """
+        results = await self.client.get_json(
+            f"{self.api_endpoint}/v4/spreadsheets/{file_id}", fields=SHEET_FIELDS
+        )
+        self.requests += 1
+        return [
+            {
+                "title": sheet["properties"]["title"],
+                "row_count": sheet["properties"].get("gridProperties", {}).get("rowCount", 0),
+                "column_count": sheet["properties"].get("gridProperties", {}).get("columnCount", 0),
+            }
+            for sheet in results.get("sheets", [])
+        ]
+
+    async def get(self, file_id: str, revision: str, ranges: list[str]) -> list[list[list]]:
+        """
+        Get values of the ranges.
+
+        Values are unformatted: numbers are numbers, dates are formatted strings.
+        Trailing empty rows and cells are not returned by the API.
+
+        Args:
+            file_id (str): file id on Google Drive.
+            revision (str): revision of the file, cached values of other revisions are not used.
+            ranges (list[str]): ranges in A1 notation with sheet names, see `sheet_range`.
+
+        Returns:
+            list[list[list]]: rows of values of every range.
+
+        Raises:
+            httpx.HTTPError: if the request failed.
+        """
+        values = {}
+        with self._lock:
+            for a1_range in ranges:
+                key = (file_id, revision, a1_range)
+                if key in self._ranges:
+                    self._ranges.move_to_end(key)
+                    values[a1_range] = self._ranges[key]
+        self.hits += len(values)
+        missing = list(dict.fromkeys(a1_range for a1_range in ranges if a1_range not in values))
+        if missing:
+            self.misses += len(missing)
+            self.requests += 1
+            results = await self.client.get_json(
+                f"{self.api_endpoint}/v4/spreadsheets/{file_id}/values:batchGet",
+                ranges=missing,
+                majorDimension="ROWS",
+                valueRenderOption="UNFORMATTED_VALUE",
+                dateTimeRenderOption="FORMATTED_STRING",
+            )
+            # Value ranges are returned in order of requested ranges.
+            for a1_range, value_range in zip(missing, results.get("valueRanges", [])):
+                values[a1_range] = value_range.get("values", [])
+            with self._lock:
+                for a1_range in missing:
+                    self._ranges[(file_id, revision, a1_range)] = values[a1_range]
+                while len(self._ranges) > self.max_ranges:
+                    self._ranges.popitem(last=False)
+            logger.debug("%d ranges of %s are fetched", len(missing), file_id)
+        return [values[a1_range] for a1_range in ranges]
+
+    def stats(self) -> dict:
+        """
+        Get counters of range reads.
+
+        Returns:
+            dict: counters with keys: ranges, hits, misses, requests.
+        """
+        with self._lock:
+            ranges = len(self._ranges)
+        return {"ranges": ranges, "hits": self.hits, "misses": self.misses, "requests": self.requests}
@@ -1,9 +1,14 @@
+import asyncio
+
 import httpx
 
 from agent.exceptions import AgentError
+from agent.excel.readers_manager import Manager
 from agent.GD.requestor import GDRequestor
 from agent.graph.workflows import interact
 from agent.llm.models import LLMAgent
+from agent.llm.tokens import load_encoding
+from agent.stats import StatsLog
 
 
 class Agent:
@@ -69,7 +74,9 @@ class Agent:
                 break
         else:
             raise AgentError(f"model {LLMAgent.model} not available.")
-        GDRequestor()
+        GDRequestor().start(Manager.is_in_use)
+        StatsLog.start()
+        asyncio.get_running_loop().run_in_executor(None, load_encoding)
         return True
 
     async def communicate(self, user_id: int, messages: list) -> str:
@@ -13,6 +13,69 @@ GD_CREDENTIALS_FILE = Path(os.getenv("GD_CREDENTIALS_FILE"))
 LLM_API_NAME = os.getenv("LLM_API_NAME", "gpt-4o-2024-11-20")
 LLM_API_KEY = os.getenv("LLM_API_KEY", "")
 LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+# Max count of kept-alive connections to LLM API shared by all requests.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# Token budget of the message history in the prompt, older messages are folded
+# into a rolling summary. The latest messages are kept in any case.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+HISTORY_MIN_MESSAGES = int(os.getenv("HISTORY_MIN_MESSAGES", "2"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "500"))
+# Tool calls of one model step run concurrently, each call is limited by its timeout.
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "60"))
+# Timeouts of separate tools in format "tool=seconds,...", they override TOOL_TIMEOUT.
+TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (
+        item.partition("=") for item in os.getenv("TOOL_TIMEOUTS", "get_site_info=20").split(",")
+    )
+    if seconds
+}
+# Count of memoized results of Excel tools, results are kept per file revision.
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "256"))
+# Size caps of tool results in the prompt: items of every list and characters of every text.
+TOOL_OUTPUT_MAX_ROWS = int(os.getenv("TOOL_OUTPUT_MAX_ROWS", "100"))
+TOOL_OUTPUT_MAX_TEXT = int(os.getenv("TOOL_OUTPUT_MAX_TEXT", "4000"))
+# tiktoken encoding for token counts, tokens are estimated by text length if it is not available.
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+# Files bigger than threshold are read by row chunks instead of loading to memory.
+EXCEL_STREAMING_THRESHOLD = int(os.getenv("EXCEL_STREAMING_THRESHOLD_MB", "100")) * 2**20
+EXCEL_STREAMING_CHUNK_ROWS = int(os.getenv("EXCEL_STREAMING_CHUNK_ROWS", "10000"))
+# Memory budget for sheets and search indexes kept by all readers.
+EXCEL_MEMORY_BUDGET = int(os.getenv("EXCEL_MEMORY_BUDGET_MB", "1024")) * 2**20
+# "process" parses files in a process pool, "thread" does all blocking work in threads.
+EXCEL_EXECUTOR = os.getenv("EXCEL_EXECUTOR", "process")
+EXCEL_EXECUTOR_WORKERS = int(os.getenv("EXCEL_EXECUTOR_WORKERS", "2"))
+# Interval of checks if the selected file was changed on Google Drive.
+DRIVE_REVALIDATE_SECONDS = int(os.getenv("DRIVE_REVALIDATE_SECONDS", "60"))
+# Google Drive API address, it may be changed to a local server for tests.
+DRIVE_API_ENDPOINT = os.getenv("DRIVE_API_ENDPOINT")
+DRIVE_MAX_CONNECTIONS = int(os.getenv("DRIVE_MAX_CONNECTIONS", "20"))
+DRIVE_DOWNLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_MB", "8")) * 2**20
+DRIVE_DOWNLOAD_RETRIES = int(os.getenv("DRIVE_DOWNLOAD_RETRIES", "5"))
+# Files bigger than threshold are downloaded by several parallel byte ranges.
+DRIVE_PARALLEL_THRESHOLD = int(os.getenv("DRIVE_PARALLEL_THRESHOLD_MB", "32")) * 2**20
+DRIVE_PARALLEL_PARTS = int(os.getenv("DRIVE_PARALLEL_PARTS", "4"))
+# Catalog of files is updated by Drive changes in background, and before
+# listing if it is older than max staleness.
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_MAX_STALENESS = int(os.getenv("CATALOG_MAX_STALENESS_SECONDS", "300"))
+# Native Google Sheets are read by cell ranges, values of recent ranges are cached.
+SHEETS_API_ENDPOINT = os.getenv("SHEETS_API_ENDPOINT")
+SHEETS_RANGE_CACHE_SIZE = int(os.getenv("SHEETS_RANGE_CACHE_SIZE", "256"))
+# Cached files are evicted least recently used first over the quota, and
+# after they were not used for TTL; 0 disables a limit.
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "2048")) * 2**20
+CACHE_TTL = int(float(os.getenv("CACHE_TTL_HOURS", "168")) * 3600)
+CACHE_COLLECT_SECONDS = int(os.getenv("CACHE_COLLECT_SECONDS", "600"))
+# Counters of files, readers and tool results caches are logged at DEBUG level; 0 disables the log.
+STATS_LOG_SECONDS = int(os.getenv("STATS_LOG_SECONDS", "300"))
+# Download and parse of the file named in the message while LLM selects the file.
+FILE_PREFETCH = os.getenv("FILE_PREFETCH", "true").lower() == "true"
+# The last message of the tools loop is the answer and reselection is a tool,
+# otherwise the answer is made by one more call with JSON response schema.
+FILE_QUESTIONS_SINGLE_PASS = os.getenv("FILE_QUESTIONS_SINGLE_PASS", "true").lower() == "true"
 
 _log_level = os.getenv("LOG_LEVEL", "INFO")
 
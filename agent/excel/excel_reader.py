@@ -1,31 +1,214 @@
+import asyncio
+import base64
+import json
 import re
+from pathlib import Path
 
 import pandas as pd
-from openpyxl import load_workbook
+
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+
+from agent.constants import EXCEL_STREAMING_THRESHOLD, TOOL_OUTPUT_MAX_ROWS
+from agent.excel.executor import run_in_process, run_in_thread
+from agent.excel.search_index import MATCH_MODES
+from agent.excel.sheets import SheetsWorkbook
+from agent.excel.streaming import StreamingWorkbook
+from agent.excel.workbook import Workbook
+from agent.GD.requestor import GDRequestor
+
+MAX_PAGE_SIZE = 50
+# Running loads of sheets, so concurrent requests to one sheet share a parse.
+_loading = {}
+
+
+def _encode_cursor(query: list, row: int) -> str:
+    """Makes opaque cursor for the next page of the search."""
+    return base64.urlsafe_b64encode(
+        json.dumps([query, row], ensure_ascii=False).encode()
+    ).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[list, int]:
+    """
+    Decodes cursor made by `_encode_cursor`.
+
+    Raises:
+        ValueError: if cursor is malformed.
+    """
+    try:
+        query, row = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError(cursor) from exc
+    if not isinstance(row, int):
+        raise ValueError(cursor)
+    return query, row
+
+
+def open_workbook(file_path: str, revision: str = None, pool=None) -> Workbook | SheetsWorkbook:
+    """
+    Opens workbook of the file in the mode suitable for its size.
+
+    Files bigger than EXCEL_STREAMING_THRESHOLD are read in streaming mode by
+    row chunks, other files are loaded to memory. Stubs of native Google
+    Sheets are read by cell ranges.
+
+    Args:
+        file_path (str): path to file.
+        revision (str, optional): revision of the file. Defaults to revision made from file stat.
+        pool (ReaderPool, optional): memory pool for data loaded from the workbook.
+
+    Returns:
+        Workbook | SheetsWorkbook: opened workbook.
+    """
+    file_path = Path(file_path)
+    if file_path.suffix == ".gsheet":
+        # Imported here, the module imports this one.
+        from agent.excel.readers_manager import Manager
+
+        requestor = GDRequestor()
+
+        async def export(file_id: str) -> Path:
+            return await requestor.download_file(file_id, Manager.is_in_use, export=True)
+
+        return SheetsWorkbook(file_path, requestor.get_values, export, pool=pool)
+    if file_path.suffix != ".xls" and file_path.stat().st_size > EXCEL_STREAMING_THRESHOLD:
+        return StreamingWorkbook(file_path, revision, pool=pool)
+    return Workbook(file_path, revision, pool=pool)
+
+
+def _prepare_sheets(file_path: str, revision: str, sheet_name: str) -> pd.DataFrame | None:
+    """
+    Parses the file in a worker process and stores its sheets with profiles to sidecar cache.
+
+    The file is parsed once for all its sheets, so next sheets are read from
+    sidecar cache without a worker. Streaming files prepare the requested
+    sheet only, they are never parsed whole.
+
+    Args:
+        file_path (str): path to file.
+        revision (str): revision of the file.
+        sheet_name (str): requested sheet name.
+
+    Returns:
+        pd.DataFrame | None: data of the requested sheet if it can not be stored to sidecar, else None.
+    """
+    workbook = open_workbook(file_path, revision)
+    if isinstance(workbook, StreamingWorkbook):
+        workbook.get_profile(sheet_name)
+        return None
+    for name in workbook.sheet_names:
+        workbook.get_profile(name)
+        if name != sheet_name and workbook.sidecar.has_sheet(name):
+            # Stored sheets are not kept in the worker memory.
+            workbook.evict("sheet", name)
+    df = workbook.get_dataframe(sheet_name)
+    return None if workbook.sidecar.has_sheet(sheet_name) else df
 
 
 class ExcelReader:
     """
     Class for reading Excel files.
+
+    Reader is a lightweight view onto a workbook, readers of different users
+    may share one workbook with read-only parsed data. Blocking work runs off
+    the event loop: files are parsed in the process pool, other operations run
+    in the thread pool.
     """
 
-    def __init__(self, file_name: str, file_path: str):
+    def __init__(
+        self,
+        file_name: str,
+        file_path: str,
+        revision: str = None,
+        pool=None,
+        workbook: Workbook | SheetsWorkbook = None,
+    ):
         """
         Initialize ExcelReader.
 
         Args:
             file_name (str): file name.
             file_path (str): path to file.
+            revision (str, optional): revision of the file. Defaults to revision made from file stat.
+            pool (ReaderPool, optional): memory pool for data loaded by the reader.
+            workbook (Workbook, optional): already opened workbook of the file, shared with other readers.
         """
         self.file_name = file_name
         self.file_path = file_path
-        excel_file = pd.ExcelFile(file_path)
-        self.sheets = excel_file.sheet_names
-        self.dataframes = {}
+        self.workbook = workbook or open_workbook(file_path, revision, pool)
+
+    @property
+    def sheets(self) -> list[str]:
+        """Sheet names of the file, reading them may block."""
+        return self.workbook.sheet_names
+
+    async def _get_sheets(self) -> list[str]:
+        """Get sheet names without blocking the event loop."""
+        return await run_in_thread(lambda: self.workbook.sheet_names)
+
+    async def _get_workbook(self) -> Workbook:
+        """Get workbook with sheet data, native Google Sheets are exported on the first call."""
+        if isinstance(self.workbook, SheetsWorkbook):
+            return await self.workbook.open()
+        return self.workbook
+
+    async def _read_range(
+        self, sheet_name: str, min_col: int, min_row: int, max_col: int, max_row: int
+    ) -> list[tuple]:
+        """Reads cell values of the range, not exported Google Sheets are read by API."""
+        if isinstance(self.workbook, SheetsWorkbook) and self.workbook.full is None:
+            return await self.workbook.read_range(sheet_name, min_col, min_row, max_col, max_row)
+        workbook = await self._get_workbook()
+        return await run_in_thread(
+            workbook.read_range, sheet_name, min_col, min_row, max_col, max_row
+        )
+
+    async def _prepare(self, sheet_name: str, profile: bool = False) -> None:
+        """
+        Makes the sheet (and its profile) available without parsing the file in this process.
 
-    def _get_workbook(self):
-        """Lazy loading workbook for cell operations."""
-        return load_workbook(self.file_path, data_only=True)
+        The sheet is loaded with its profile, concurrent calls for the same
+        sheet wait for one load.
+
+        Args:
+            sheet_name (str): sheet name.
+            profile (bool): if True, the sheet profile is prepared too.
+        """
+        workbook = await self._get_workbook()
+        need_data = not isinstance(workbook, StreamingWorkbook) and not workbook.has_sheet_data(
+            sheet_name
+        )
+        if not need_data and not (profile and not workbook.has_profile(sheet_name)):
+            return
+
+        key = (id(workbook), sheet_name)
+        task = _loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(workbook, sheet_name))
+            _loading[key] = task
+            task.add_done_callback(lambda _: _loading.pop(key, None))
+        # Cancelled caller doesn't cancel the load awaited by other callers.
+        await asyncio.shield(task)
+
+    async def _load(self, workbook: Workbook, sheet_name: str) -> None:
+        """Loads the sheet by a worker process, the workbook reads the result from sidecar."""
+
+        def load_locally() -> None:
+            workbook.get_profile(sheet_name)
+
+        if workbook.sidecar is None:
+            await run_in_thread(load_locally)
+            return
+        df = await run_in_process(
+            _prepare_sheets,
+            str(workbook.file_path),
+            workbook.sidecar.revision,
+            sheet_name,
+            fallback=load_locally,
+        )
+        workbook.sidecar.reload()
+        if df is not None:
+            workbook.put_dataframe(sheet_name, df)
 
     async def get_file_summary(self) -> dict:
         """
@@ -34,10 +217,11 @@ class ExcelReader:
         Returns:
             dict: Summary of the file with keys: file_name, sheet_count, sheet_names
         """
+        sheets = await self._get_sheets()
         return {
             "file_name": self.file_name,
-            "sheet_count": len(self.sheets),
-            "sheet_names": self.sheets,
+            "sheet_count": len(sheets),
+            "sheet_names": sheets,
         }
 
     async def get_sheet_preview(self, sheet_name: str = None) -> dict:
@@ -48,58 +232,88 @@ class ExcelReader:
             sheet_name (str): name of sheet for preview
 
         Returns:
-            dict: Preview of the sheet with keys: sheet_name, row_count, column_count, columns, preview_rows, data_types
+            dict: Preview of the sheet with keys: sheet_name, row_count, column_count, columns, preview_rows, data_types.
+            Each preview row is a list of values in order of columns. Row count of not exported
+            Google Sheets may be None, max_row_count is given for them.
         """
+        sheets = await self._get_sheets()
         if sheet_name is None:
-            sheet_name = self.sheets[0]
-
-        if sheet_name not in self.dataframes:
-            self.dataframes[sheet_name] = pd.read_excel(self.file_path, sheet_name)
+            sheet_name = sheets[0]
+        if sheet_name not in sheets:
+            return {"error": f"Sheet {sheet_name} not found"}
 
-        df = self.dataframes[sheet_name]
-
-        return {
-            "sheet_name": sheet_name,
-            "row_count": len(df),
-            "column_count": len(df.columns),
-            "columns": df.columns.tolist(),
-            "preview_rows": df.head(5).to_dict(orient="records"),
-            "data_types": {col: str(dtype) for col, dtype in df.dtypes.items()},
-        }
-
-    async def search_data(self, sheet_name: str, search_term: str) -> dict:
+        if isinstance(self.workbook, SheetsWorkbook) and not self.workbook.has_profile(sheet_name):
+            # Preview of not exported Google Sheets is made from the first rows.
+            preview = await self.workbook.get_preview(sheet_name)
+        else:
+            workbook = await self._get_workbook()
+            if not isinstance(workbook, StreamingWorkbook):
+                await self._prepare(sheet_name, profile=True)
+            preview = await run_in_thread(workbook.get_preview, sheet_name)
+        # Rows are lists, so column names are not repeated in every row.
+        rows = [[row.get(column) for column in preview["columns"]] for row in preview["preview_rows"]]
+        return {"sheet_name": sheet_name, **preview, "preview_rows": rows}
+
+    async def search_data(
+        self,
+        sheet_name: str,
+        search_term: str,
+        match: str = "contains",
+        case_sensitive: bool = False,
+        cursor: str = None,
+        page_size: int = 10,
+    ) -> dict:
         """
         Search data in the sheet by key word.
 
         Args:
             sheet_name (str): sheet name for search.
-            search_term (str): search key word.
+            search_term (str): search key word, it is treated as plain text.
+            match (str): "contains" - cell contains the term, "prefix" - cell or any word in it starts with the term, "exact" - cell equals the term. Defaults to "contains".
+            case_sensitive (bool): if True, letter case must match. Defaults to False.
+            cursor (str): next_cursor from the previous result to get the next page of the same search. Defaults to None.
+            page_size (int): count of matches in the page, at most 50. Defaults to 10.
 
         Returns:
-            dict: Search results with keys: sheet_name, search_term, matches_count, matches.
+            dict: Search results with keys: sheet_name, search_term, matches_count, matches_count_is_exact, columns, matches, next_cursor.
+            Each match is a list of values in order of columns: row (row number on the sheet), matched_columns, then values of the sheet columns.
+            next_cursor is null when there are no more matches.
             Key error means wrong cell reference or out from bounds, so such cell is empty.
         """
-        if sheet_name not in self.dataframes:
-            self.dataframes[sheet_name] = pd.read_excel(self.file_path, sheet_name)
-
-        df = self.dataframes[sheet_name]
-
-        matches = []
-        for col in df.columns:
-            if df[col].dtype == "object":
-                matches.extend(
-                    df[
-                        df[col]
-                        .astype(str)
-                        .str.contains(search_term, case=False, na=False)
-                    ].to_dict(orient="records")
-                )
+        if match not in MATCH_MODES:
+            return {"error": f"Unknown match mode {match}, use one of {MATCH_MODES}"}
+        query = [sheet_name, search_term, match, case_sensitive]
+        after = -1
+        if cursor:
+            try:
+                cursor_query, after = _decode_cursor(cursor)
+            except ValueError:
+                return {"error": f"Invalid cursor: {cursor}"}
+            if cursor_query != query:
+                return {"error": "Cursor belongs to another search"}
+        page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+        if sheet_name not in await self._get_sheets():
+            return {"error": f"Sheet {sheet_name} not found"}
+
+        await self._prepare(sheet_name)
+        workbook = await self._get_workbook()
+        page, total, is_exact, has_more = await run_in_thread(
+            workbook.search, sheet_name, search_term, match, case_sensitive, after, page_size
+        )
+        columns = list(page[0][2]) if page else []
+        matches = [
+            [row + 2, matched_columns, *(values[column] for column in columns)]
+            for row, matched_columns, values in page
+        ]
 
         return {
             "sheet_name": sheet_name,
             "search_term": search_term,
-            "matches_count": len(matches),
-            "matches": matches[:10],  # Limit the number of results
+            "matches_count": total,
+            "matches_count_is_exact": is_exact,
+            "columns": ["row", "matched_columns", *columns],
+            "matches": matches,
+            "next_cursor": _encode_cursor(query, page[-1][0]) if has_more else None,
         }
 
     async def get_cell_value(self, sheet_name: str, cell_reference: str) -> dict:
@@ -114,17 +328,15 @@ class ExcelReader:
             dict: Cell value with keys: sheet_name, cell_reference, value
         """
         try:
-            wb = self._get_workbook()
-            if sheet_name not in wb.sheetnames:
+            if sheet_name not in await self._get_sheets():
                 return {"error": f"Sheet {sheet_name} not found"}
 
-            ws = wb[sheet_name]
-
             if not re.match(r"^[A-Z]+\d+$", cell_reference.upper()):
                 return {"error": f"Invalid cell reference format: {cell_reference}"}
 
-            cell = ws[cell_reference.upper()]
-            value = cell.value
+            row, column = coordinate_to_tuple(cell_reference.upper())
+            rows = await self._read_range(sheet_name, column, row, column, row)
+            value = rows[0][0]
             return {
                 "sheet_name": sheet_name,
                 "cell_reference": cell_reference.upper(),
@@ -144,43 +356,36 @@ class ExcelReader:
             range_reference (str): range reference (e.g., 'A1:C3').
 
         Returns:
-            dict: Range values
+            dict: Range values with keys: sheet_name, range_reference, anchor (top left cell of the range), columns, rows, next_row.
+            columns are "row" and letters of the range columns, each row is its row number and cell values.
+            At most TOOL_OUTPUT_MAX_ROWS rows are read, next_row is the first row which is not read, null when the whole range is read.
         """
         try:
-            wb = self._get_workbook()
-            if sheet_name not in wb.sheetnames:
+            if sheet_name not in await self._get_sheets():
                 return {"error": f"Sheet {sheet_name} not found"}
 
-            ws = wb[sheet_name]
-
-            cell_range = ws[range_reference]
-
-            values = []
-            if hasattr(cell_range, '__iter__') and not isinstance(cell_range, str):
-                for row in cell_range:
-                    if hasattr(row, '__iter__'):
-                        row_values = []
-                        for cell in row:
-                            row_values.append({
-                                "address": cell.coordinate,
-                                "value": cell.value
-                            })
-                        values.append(row_values)
-                    else:
-                        values.append([{
-                            "address": row.coordinate,
-                            "value": row.value
-                        }])
-            else:
-                values = [[{
-                    "address": cell_range.coordinate,
-                    "value": cell_range.value
-                }]]
-
+            min_col, min_row, max_col, max_row = range_boundaries(range_reference.upper())
+            first_row = min_row or 1
+            limit = first_row + TOOL_OUTPUT_MAX_ROWS
+            # One row over the limit is read to know if the range is truncated.
+            rows = await self._read_range(
+                sheet_name, min_col, min_row, max_col, limit if max_row is None else min(max_row, limit)
+            )
+            if max_row is None:
+                # Open range ends with the last row with data.
+                while rows and all(value is None for value in rows[-1]):
+                    rows.pop()
+            next_row = first_row + TOOL_OUTPUT_MAX_ROWS if len(rows) > TOOL_OUTPUT_MAX_ROWS else None
+            rows = rows[:TOOL_OUTPUT_MAX_ROWS]
+
+            width = max(map(len, rows), default=0)
             return {
                 "sheet_name": sheet_name,
                 "range_reference": range_reference,
-                "values": values
+                "anchor": f"{get_column_letter(min_col or 1)}{first_row}",
+                "columns": ["row", *(get_column_letter((min_col or 1) + i) for i in range(width))],
+                "rows": [[first_row + j, *row] for j, row in enumerate(rows)],
+                "next_row": next_row,
             }
 
         except Exception as e:
@@ -197,41 +402,18 @@ class ExcelReader:
         Returns:
             dict: Analysis results with keys: sheet_name, column_name, stats
         """
-        if sheet_name not in self.dataframes:
-            self.dataframes[sheet_name] = pd.read_excel(self.file_path, sheet_name)
+        if sheet_name not in await self._get_sheets():
+            return {"error": f"Sheet {sheet_name} not found"}
 
-        df = self.dataframes[sheet_name]
+        await self._prepare(sheet_name, profile=True)
+        workbook = await self._get_workbook()
+        stats = (await run_in_thread(workbook.get_profile, sheet_name))["stats"]
 
-        if column_name not in df.columns:
+        if column_name not in stats:
             return {"error": f"Column {column_name} not found"}
 
-        column = df[column_name]
-
-        # Basic statistics
-        stats = {
-            "count": len(column),
-            "null_count": column.isna().sum(),
-            "unique_values": column.nunique(),
+        return {
+            "sheet_name": sheet_name,
+            "column_name": column_name,
+            "stats": stats[column_name],
         }
-
-        # Additional statistics for numerical columns
-        if pd.api.types.is_numeric_dtype(column):
-            stats.update(
-                {
-                    "min": float(column.min()),
-                    "max": float(column.max()),
-                    "mean": float(column.mean()),
-                    "median": float(column.median()),
-                    "std": float(column.std()),
-                }
-            )
-
-        # For categorical data
-        else:
-            # Most frequent values
-            value_counts = column.value_counts().head(5).to_dict()
-            stats["most_common_values"] = {
-                str(k): int(v) for k, v in value_counts.items()
-            }
-
-        return {"sheet_name": sheet_name, "column_name": column_name, "stats": stats}
@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from logging import getLogger
+from typing import Any, Callable
+
+from agent.constants import EXCEL_EXECUTOR, EXCEL_EXECUTOR_WORKERS, LOG_LEVEL
+
+logger = getLogger("excel")
+logger.setLevel(LOG_LEVEL)
+
+_settings = {"mode": EXCEL_EXECUTOR, "workers": EXCEL_EXECUTOR_WORKERS}
+_thread_pool = None
+_process_pool = None
+
+
+def configure(mode: str = None, workers: int = None) -> None:
+    """
+    Changes executor settings, running pools are shut down.
+
+    Args:
+        mode (str, optional): "process" or "thread".
+        workers (int, optional): count of workers in each pool.
+    """
+    global _thread_pool, _process_pool
+    if mode is not None:
+        _settings["mode"] = mode
+    if workers is not None:
+        _settings["workers"] = workers
+    for pool in (_thread_pool, _process_pool):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _thread_pool = _process_pool = None
+
+
+def process_mode() -> bool:
+    """Returns True if CPU-heavy work goes to the process pool."""
+    return _settings["mode"] == "process"
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=_settings["workers"], thread_name_prefix="excel"
+        )
+    return _thread_pool
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Workers are spawned, forking a process with running threads is unsafe.
+        _process_pool = ProcessPoolExecutor(
+            max_workers=_settings["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """
+    Runs blocking function in the thread pool.
+
+    Args:
+        func (Callable): function to run.
+
+    Returns:
+        Any: result of the function.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_thread_pool(), partial(func, *args, **kwargs)
+    )
+
+
+async def run_in_process(func: Callable, *args, fallback: Callable = None) -> Any:
+    """
+    Runs CPU-heavy function in the process pool.
+
+    The function and its arguments must be picklable. When the process pool is
+    disabled or broken, the fallback (or the function itself) runs in the thread pool.
+
+    Args:
+        func (Callable): module level function to run.
+        fallback (Callable, optional): function without arguments to run in a thread instead.
+
+    Returns:
+        Any: result of the function or of the fallback.
+    """
+    if process_mode():
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                _get_process_pool(), func, *args
+            )
+        except (OSError, RuntimeError) as exc:
+            _disable_process_pool(exc)
+        else:
+            try:
+                return await future
+            except (BrokenProcessPool, pickle.PicklingError) as exc:
+                _disable_process_pool(exc)
+    if fallback is not None:
+        return await run_in_thread(fallback)
+    return await run_in_thread(func, *args)
+
+
+def _disable_process_pool(exc: Exception) -> None:
+    """Switches to threads after the process pool failed."""
+    global _process_pool
+    logger.warning("Process pool is not available, threads are used: %s", exc)
+    _settings["mode"] = "thread"
+    _process_pool = None
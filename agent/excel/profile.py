@@ -0,0 +1,80 @@
+import json
+
+import pandas as pd
+
+PROFILE_VERSION = 1
+PREVIEW_ROWS = 5
+MOST_COMMON_VALUES = 5
+
+
+def preview_rows(df: pd.DataFrame) -> list[dict]:
+    """
+    Makes JSON serializable preview of the first sheet rows.
+
+    Args:
+        df (pd.DataFrame): sheet data.
+
+    Returns:
+        list[dict]: first rows as records.
+    """
+    return json.loads(df.head(PREVIEW_ROWS).to_json(orient="records", date_format="iso"))
+
+
+def build_profile(df: pd.DataFrame) -> dict:
+    """
+    Builds profile of the sheet: preview and statistics of all columns.
+
+    Statistics are computed for all columns at once, numeric columns are
+    aggregated as one frame.
+
+    Args:
+        df (pd.DataFrame): sheet data.
+
+    Returns:
+        dict: JSON serializable profile with keys: version, row_count, column_count,
+        columns, data_types, preview_rows, stats.
+    """
+    null_counts = df.isna().sum()
+    numeric_columns = [
+        column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])
+    ]
+    unique_counts = df[numeric_columns].nunique()
+    numeric_stats = (
+        df[numeric_columns].astype(float).agg(["min", "max", "mean", "median", "std"])
+        if numeric_columns
+        else None
+    )
+
+    stats = {}
+    for position, column in enumerate(df.columns):
+        column_stats = {
+            "count": len(df),
+            "null_count": int(null_counts.iloc[position]),
+        }
+        if column in numeric_columns:
+            column_stats["unique_values"] = int(unique_counts[column])
+            column_stats.update(
+                {
+                    stat: float(value)
+                    for stat, value in numeric_stats[column].items()
+                }
+            )
+        else:
+            # One hashing pass gives both distinct count and most common values.
+            value_counts = df.iloc[:, position].value_counts()
+            column_stats["unique_values"] = len(value_counts)
+            column_stats["most_common_values"] = {
+                str(k): int(v)
+                for k, v in value_counts.head(MOST_COMMON_VALUES).items()
+            }
+        stats[str(column)] = column_stats
+
+    return {
+        "version": PROFILE_VERSION,
+        "row_count": len(df),
+        "column_count": len(df.columns),
+        "columns": [str(column) for column in df.columns],
+        "data_types": {str(column): str(dtype) for column, dtype in df.dtypes.items()},
+        "preview_rows": preview_rows(df),
+        "stats": stats,
+    }
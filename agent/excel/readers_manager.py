@@ -1,27 +1,258 @@
-from agent.excel.excel_reader import ExcelReader
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from agent.constants import EXCEL_MEMORY_BUDGET
+from agent.excel.excel_reader import ExcelReader, open_workbook
+from agent.excel.sidecar import file_revision
+
+
+class ReaderPool:
+    """
+    LRU pool of data loaded by workbooks of readers, bounded by a global byte budget.
+
+    Sheet dataframes, search indexes and parsed openpyxl books of cell reads
+    are evicted in least recently used order when the budget is exceeded. A workbook which lost all its cached data also
+    releases its parsed file, so the whole reader is evicted. Evicted data is
+    loaded again on the next access. Books bigger than the whole budget are
+    not cached, workbooks check them by fits().
+    """
+
+    def __init__(self, budget: int):
+        """
+        Initialize ReaderPool.
+
+        Args:
+            budget (int): max count of bytes for cached data of all workbooks.
+        """
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.sheet_evictions = 0
+        self.reader_evictions = 0
+        self.rejected = 0
+        self._entries = OrderedDict()
+        self._workbook_entries = {}
+        self._lock = threading.RLock()
+
+    def hit(self, workbook, kind: str, sheet_name: str) -> None:
+        """
+        Marks cached data as recently used.
+
+        Args:
+            workbook (Workbook): owner of the data.
+            kind (str): kind of the data, "sheet", "index" or "book".
+            sheet_name (str): sheet name.
+        """
+        with self._lock:
+            self.hits += 1
+            key = (workbook, kind, sheet_name)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def add(self, workbook, kind: str, sheet_name: str, nbytes: int) -> None:
+        """
+        Adds loaded data to the pool and evicts old data over the budget.
+
+        Args:
+            workbook (Workbook): owner of the data.
+            kind (str): kind of the data, "sheet", "index" or "book".
+            sheet_name (str): sheet name, None for the parsed book.
+            nbytes (int): memory size of the data.
+        """
+        with self._lock:
+            self.misses += 1
+            key = (workbook, kind, sheet_name)
+            previous = self._entries.pop(key, None)
+            if previous is None:
+                previous = 0
+                self._workbook_entries[workbook] = self._workbook_entries.get(workbook, 0) + 1
+            self.used += nbytes - previous
+            self._entries[key] = nbytes
+            # The newest entry stays even if it alone exceeds the budget.
+            while self.used > self.budget and len(self._entries) > 1:
+                self._evict(*self._entries.popitem(last=False))
+
+    def fits(self, nbytes: int) -> bool:
+        """
+        Checks if data of the size may be cached, rejected data is counted.
+
+        Args:
+            nbytes (int): memory size of the data.
+
+        Returns:
+            bool: True if the data is not bigger than the budget.
+        """
+        if nbytes <= self.budget:
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def discard(self, workbook) -> None:
+        """
+        Removes all data of the workbook from the pool.
+
+        Args:
+            workbook (Workbook): workbook which is not used anymore.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] is workbook]:
+                self.used -= self._entries.pop(key)
+            self._workbook_entries.pop(workbook, None)
+
+    def stats(self) -> dict:
+        """
+        Get pool counters.
+
+        Returns:
+            dict: counters with keys: budget, used, entries, hits, misses, sheet_evictions,
+                reader_evictions, rejected.
+        """
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "used": self.used,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "sheet_evictions": self.sheet_evictions,
+                "reader_evictions": self.reader_evictions,
+                "rejected": self.rejected,
+            }
+
+    def _evict(self, key: tuple, nbytes: int) -> None:
+        """Evicts one entry from its workbook."""
+        workbook, kind, sheet_name = key
+        self.used -= nbytes
+        self.sheet_evictions += 1
+        workbook.evict(kind, sheet_name)
+        self._workbook_entries[workbook] -= 1
+        if not self._workbook_entries[workbook]:
+            del self._workbook_entries[workbook]
+            workbook.release()
+            self.reader_evictions += 1
 
 
 class Manager:
     """
     Manager for storing and retrieving ExcelReader instances.
+
+    Parsed workbooks are shared: one workbook is opened per (file id, revision)
+    and readers of all users of that file are views onto it.
     """
 
     _readers = {}
+    _reader_keys = {}
+    _workbooks = {}
+    pool = ReaderPool(EXCEL_MEMORY_BUDGET)
+    _lock = threading.RLock()
 
     @classmethod
-    def get_reader(cls, user_id: str, file_name=None, file_path=None) -> ExcelReader:
+    def get_reader(
+        cls, user_id: str, file_name=None, file_path=None, file_id=None
+    ) -> ExcelReader:
         """Get an ExcelReader instance for a given user_id.
 
-        If an instance does not exist, create a new one.
+        If an instance does not exist or it reads another file revision, create a new one.
 
         Args:
             user_id (str): Unique identifier for the user.
             file_name (str): Optional file name to pass to ExcelReader.
             file_path (str): Optional file path to pass to ExcelReader.
+            file_id (str): Optional Google Drive file id. Defaults to the file path stem.
 
         Returns:
             ExcelReader: The ExcelReader instance for the given user_id.
         """
-        if user_id not in cls._readers or file_name or file_path:
-            cls._readers[user_id] = ExcelReader(file_name, file_path)
-        return cls._readers[user_id]
+        with cls._lock:
+            if not file_path:
+                return cls._readers[user_id]
+
+            key = (file_id or Path(file_path).stem, file_revision(file_path))
+            reader = cls._readers.get(user_id)
+            if reader and cls._reader_keys[user_id] == key and reader.file_name == file_name:
+                return reader
+
+            if key not in cls._workbooks:
+                cls._workbooks[key] = [open_workbook(file_path, key[1], cls.pool), 0]
+            cls._workbooks[key][1] += 1
+            cls._release(user_id)
+            cls._readers[user_id] = ExcelReader(
+                file_name, file_path, workbook=cls._workbooks[key][0]
+            )
+            cls._reader_keys[user_id] = key
+            return cls._readers[user_id]
+
+    @classmethod
+    def get_file_key(cls, user_id: str) -> tuple | None:
+        """
+        Get key of the file revision read by the user.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+
+        Returns:
+            tuple | None: (file id, revision), None if the user has no reader.
+        """
+        with cls._lock:
+            return cls._reader_keys.get(user_id)
+
+    @classmethod
+    def release_reader(cls, user_id: str) -> None:
+        """
+        Removes reader of the user, workbook without readers is closed.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+        """
+        with cls._lock:
+            cls._release(user_id)
+
+    @classmethod
+    def _release(cls, user_id: str) -> None:
+        """Removes reader of the user, workbook without readers is closed."""
+        cls._readers.pop(user_id, None)
+        key = cls._reader_keys.pop(user_id, None)
+        if key is None:
+            return
+        cls._workbooks[key][1] -= 1
+        if not cls._workbooks[key][1]:
+            workbook, _ = cls._workbooks.pop(key)
+            cls.pool.discard(getattr(workbook, "full", None) or workbook)
+
+    @classmethod
+    def is_in_use(cls, file_path: Path) -> bool:
+        """
+        Checks if the file is opened by readers.
+
+        Args:
+            file_path (Path): path to file.
+
+        Returns:
+            bool: True if a workbook of the file, or of its export for Google Sheets, is open.
+        """
+        with cls._lock:
+            return any(
+                Path(opened.file_path) == Path(file_path)
+                for workbook, _ in cls._workbooks.values()
+                for opened in (workbook, getattr(workbook, "full", None))
+                if opened is not None
+            )
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get counters of readers memory pool.
+
+        Returns:
+            dict: counters with keys: readers, workbooks, budget, used, entries, hits, misses, sheet_evictions,
+                reader_evictions, rejected.
+        """
+        with cls._lock:
+            return {
+                "readers": len(cls._readers),
+                "workbooks": len(cls._workbooks),
+                **cls.pool.stats(),
+            }
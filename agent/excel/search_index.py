@@ -0,0 +1,235 @@
+import heapq
+import itertools
+import re
+import sys
+from bisect import bisect_left
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+MATCH_MODES = ("contains", "prefix", "exact")
+NGRAM_SIZE = 3
+PREFIX_KEY_LENGTH = 32
+# Rough size of a dict entry with its key and value objects, for memory estimates.
+DICT_ENTRY_SIZE = 200
+WORD = re.compile(r"\w+")
+WORD_START = re.compile(r"(?<!\w)\w")
+
+
+def _ngrams(text: str) -> set[str]:
+    """Returns the set of character n-grams of the text."""
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class ColumnIndex:
+    """
+    Search index over text values of one column.
+
+    Values are indexed once per distinct value: an n-gram index for substring
+    search, sorted value prefixes and words for prefix search and a value map
+    for exact search. Rows of every distinct value are kept grouped and sorted, so a query
+    costs the count of matched distinct values, not the count of rows.
+    """
+
+    def __init__(self, column: pd.Series):
+        """
+        Builds the index.
+
+        Args:
+            column (pd.Series): column to index.
+        """
+        positions = np.flatnonzero(column.notna().to_numpy())
+        codes, uniques = pd.factorize(column.iloc[positions].astype(str))
+        order = np.argsort(codes, kind="stable")
+        self._rows = positions[order]
+        self._offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(uniques)), out=self._offsets[1:])
+
+        self.values = uniques.tolist()
+        self.lowered = [value.lower() for value in self.values]
+
+        counts = np.fromiter(
+            (max(len(value) - NGRAM_SIZE + 1, 0) for value in self.lowered),
+            dtype=np.int64,
+            count=len(self.lowered),
+        )
+        ngrams = [
+            value[i : i + NGRAM_SIZE]
+            for value in self.lowered
+            for i in range(len(value) - NGRAM_SIZE + 1)
+        ]
+        ngram_codes, ngram_keys = pd.factorize(np.array(ngrams, dtype=object))
+        # Sorted unique (ngram, value) pairs, packed into one integer each.
+        pairs = ngram_codes.astype(np.int64) * len(self.values) + np.repeat(
+            np.arange(len(self.values), dtype=np.int64), counts
+        )
+        pairs.sort()
+        # Values shorter than an n-gram give no pairs, the mask needs at least one pair.
+        if len(pairs):
+            pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        self._ngram_uids = pairs % max(len(self.values), 1)
+        bounds = np.searchsorted(
+            pairs // max(len(self.values), 1), np.arange(len(ngram_keys) + 1)
+        ).tolist()
+        self._ngrams = {
+            ngram: (bounds[code], bounds[code + 1])
+            for code, ngram in enumerate(ngram_keys)
+        }
+
+        exact = {}
+        prefixes = []
+        for uid, value in enumerate(self.lowered):
+            exact.setdefault(value, []).append(uid)
+            prefixes.append((value[:PREFIX_KEY_LENGTH], uid))
+            prefixes.extend((word, uid) for word in set(WORD.findall(value)))
+        self._exact = exact
+        prefixes.sort()
+        self._prefix_keys = [key for key, _ in prefixes]
+        self._prefix_uids = np.array([uid for _, uid in prefixes], dtype=np.int64)
+
+        self.nbytes = (
+            sum(
+                array.nbytes
+                for array in (self._rows, self._offsets, self._ngram_uids, self._prefix_uids)
+            )
+            + sum(map(sys.getsizeof, self.values))
+            + sum(map(sys.getsizeof, self.lowered))
+            + sum(map(sys.getsizeof, self._prefix_keys))
+            + DICT_ENTRY_SIZE * (len(self._ngrams) + len(self._exact))
+        )
+
+    def find(self, term: str, match: str = "contains", case_sensitive: bool = False) -> list[int]:
+        """
+        Finds distinct values matching the term.
+
+        Args:
+            term (str): search term, it is treated as a literal string.
+            match (str): one of "contains", "prefix", "exact".
+            case_sensitive (bool): if True, letter case must match.
+
+        Returns:
+            list[int]: ids of matched distinct values.
+        """
+        lowered = term.lower()
+        if match == "exact":
+            candidates = self._exact.get(lowered, [])
+        elif match == "prefix":
+            # Words of a multi-word term are found by their first word.
+            first_word = WORD.match(lowered)
+            keys = {lowered[:PREFIX_KEY_LENGTH]}
+            if first_word:
+                keys.add(first_word.group())
+            candidates = set()
+            for key in keys:
+                start = bisect_left(self._prefix_keys, key)
+                end = bisect_left(self._prefix_keys, key + "\U0010ffff", lo=start)
+                candidates.update(self._prefix_uids[start:end].tolist())
+            candidates = sorted(candidates)
+        elif len(lowered) >= NGRAM_SIZE:
+            bounds = [self._ngrams.get(ngram) for ngram in _ngrams(lowered)]
+            if None in bounds:
+                return []
+            postings = sorted(
+                (self._ngram_uids[start:end] for start, end in bounds), key=len
+            )
+            candidates = postings[0]
+            for uids in postings[1:]:
+                candidates = np.intersect1d(candidates, uids, assume_unique=True)
+            candidates = candidates.tolist()
+        else:
+            candidates = range(len(self.values))
+
+        return [uid for uid in candidates if self._check(uid, term, lowered, match, case_sensitive)]
+
+    def _check(self, uid: int, term: str, lowered: str, match: str, case_sensitive: bool) -> bool:
+        """Verifies that the distinct value really matches the term."""
+        value = self.values[uid] if case_sensitive else self.lowered[uid]
+        term = term if case_sensitive else lowered
+        if match == "exact":
+            return value == term
+        if match == "prefix":
+            if term not in value:
+                return False
+            return value.startswith(term) or any(
+                value.startswith(term, word.start()) for word in WORD_START.finditer(value)
+            )
+        return term in value
+
+    def rows(self, uid: int) -> np.ndarray:
+        """Returns sorted row positions holding the distinct value."""
+        return self._rows[self._offsets[uid] : self._offsets[uid + 1]]
+
+
+class SheetIndex:
+    """
+    Search index over text columns of a sheet.
+
+    Attributes:
+        nbytes (int): estimated memory size of the index.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Builds indexes for all text columns of the sheet.
+
+        Args:
+            df (pd.DataFrame): sheet data.
+        """
+        self.columns = {
+            column: ColumnIndex(df[column])
+            for column in df.columns
+            if df[column].dtype == "object" or isinstance(df[column].dtype, pd.StringDtype)
+        }
+        self.nbytes = sum(index.nbytes for index in self.columns.values())
+
+    def search(
+        self,
+        term: str,
+        match: str = "contains",
+        case_sensitive: bool = False,
+        after: int = -1,
+        limit: int = 10,
+    ) -> tuple[list[tuple[int, list]], int, bool, bool]:
+        """
+        Finds rows with at least one matching text cell.
+
+        Rows are merged lazily in sheet order, so only one page of rows is built.
+
+        Args:
+            term (str): search term, it is treated as a literal string.
+            match (str): one of "contains", "prefix", "exact".
+            case_sensitive (bool): if True, letter case must match.
+            after (int): row position after which the page starts. Defaults to -1.
+            limit (int): max count of rows in the page. Defaults to 10.
+
+        Returns:
+            tuple: page of matched row positions with lists of matched columns,
+            total count of matched rows, flag if the total is exact and flag if
+            there are more rows after the page.
+        """
+        sources = []
+        total = 0
+        matched_columns = 0
+        for column, index in self.columns.items():
+            uids = index.find(term, match, case_sensitive)
+            matched_columns += bool(uids)
+            for uid in uids:
+                rows = index.rows(uid)
+                total += len(rows)
+                rows = rows[np.searchsorted(rows, after, side="right") :]
+                if len(rows):
+                    # The column is bound now and rows are converted lazily, the merge stops at the page limit.
+                    sources.append(zip(map(int, rows), itertools.repeat(column)))
+
+        page = []
+        # Rows of different columns are merged by row only, column names may be not comparable.
+        for row, column in heapq.merge(*sources, key=itemgetter(0)):
+            if page and page[-1][0] == row:
+                page[-1][1].append(column)
+                continue
+            if len(page) == limit:
+                return page, total, matched_columns <= 1, True
+            page.append((row, [column]))
+        # Without overlaps between columns the count of matched cells is the count of rows.
+        return page, total, matched_columns <= 1, False
@@ -0,0 +1,191 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import pandas as pd
+from openpyxl.utils.cell import get_column_letter
+
+from agent.excel.profile import PREVIEW_ROWS, preview_rows
+from agent.excel.streaming import _column_names
+from agent.excel.workbook import Workbook
+from agent.GD.sheets import sheet_range
+
+
+def _a1_range(min_col: int, min_row: int, max_col: int, max_row: int) -> str:
+    """Makes A1 notation of the range bounds, None bounds are left open."""
+    start = f"{get_column_letter(min_col) if min_col else ''}{min_row or ''}"
+    end = f"{get_column_letter(max_col) if max_col else ''}{max_row or ''}"
+    return f"{start}:{end}" if end else start
+
+
+class SheetsWorkbook:
+    """
+    Native Google Sheets file read by cell ranges.
+
+    The file is cached as a stub with the sheets list, cells and previews are
+    read by Sheets API ranges. Whole sheet operations (search, profiles) need
+    the sheet data, for them the file is exported to xlsx once and opened as a
+    usual workbook, which is used for all reads after that.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        get_values: Callable[[str, str, list[str]], Awaitable[list[list[list]]]],
+        export: Callable[[str], Awaitable[Path]],
+        pool=None,
+    ):
+        """
+        Initialize SheetsWorkbook.
+
+        Args:
+            file_path (str): path to stub file made by `GDRequestor.download_file`.
+            get_values (Callable): reads cell ranges by file id, revision and A1 ranges,
+                see `GDRequestor.get_values`.
+            export (Callable): exports the file by id to xlsx and returns path to it.
+            pool (ReaderPool, optional): memory pool for data of the exported workbook.
+        """
+        self.file_path = Path(file_path)
+        self.pool = pool
+        self._get_values = get_values
+        self._export_file = export
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            stub = json.load(f)
+        self.file_id = stub["id"]
+        self.revision = stub["revision"]
+        self._sheets = {sheet["title"]: sheet for sheet in stub["sheets"]}
+        self._previews = {}
+        self._exporting = None
+        self.full = None
+
+    @property
+    def sheet_names(self) -> list[str]:
+        """Names of the workbook sheets."""
+        return list(self._sheets)
+
+    async def open(self) -> Workbook:
+        """
+        Get workbook of the exported file, the file is exported on the first call.
+
+        Returns:
+            Workbook: opened workbook.
+
+        Raises:
+            GoogleDriveError: if problem with google drive connection.
+        """
+        if self.full is None:
+            if self._exporting is None or self._exporting.cancelled():
+                self._exporting = asyncio.ensure_future(self._export())
+            # Cancelled caller doesn't cancel the export awaited by other callers.
+            self.full = await asyncio.shield(self._exporting)
+        return self.full
+
+    async def _export(self) -> Workbook:
+        """Exports the file to xlsx and opens it."""
+        # Imported here, the module imports this one.
+        from agent.excel.excel_reader import open_workbook
+
+        file_path = await self._export_file(self.file_id)
+        return open_workbook(file_path, pool=self.pool)
+
+    def has_profile(self, sheet_name: str) -> bool:
+        """
+        Checks if the sheet profile was built before.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            bool: True if the file is exported and its profile is built.
+        """
+        return self.full is not None and self.full.has_profile(sheet_name)
+
+    async def read_range(
+        self, sheet_name: str, min_col: int, min_row: int, max_col: int, max_row: int
+    ) -> list[tuple]:
+        """
+        Reads cell values of the rectangular range, bounds are 1-based and inclusive.
+
+        Cells out of the sheet grid are empty, they are not requested.
+
+        Args:
+            sheet_name (str): sheet name.
+            min_col (int): first column, None means the first column of the sheet.
+            min_row (int): first row, None means the first row of the sheet.
+            max_col (int): last column, None means the last column with data.
+            max_row (int): last row, None means the last row with data.
+
+        Returns:
+            list[tuple]: rows of cell values.
+
+        Raises:
+            GoogleDriveError: if problem with google drive connection.
+        """
+        sheet = self._sheets[sheet_name]
+        width = max_col - (min_col or 1) + 1 if max_col else None
+        height = max_row - (min_row or 1) + 1 if max_row else None
+        if (min_row or 1) > sheet["row_count"] or (min_col or 1) > sheet["column_count"]:
+            rows = []
+        else:
+            # Sheets API rejects ranges exceeding the grid.
+            a1_range = _a1_range(
+                min_col,
+                min_row,
+                min(max_col, sheet["column_count"]) if max_col else None,
+                min(max_row, sheet["row_count"]) if max_row else None,
+            )
+            (rows,) = await self._get_values(
+                self.file_id, self.revision, [sheet_range(sheet_name, a1_range)]
+            )
+        if width is None:
+            width = max(map(len, rows), default=0)
+        if height is None:
+            height = len(rows)
+        rows = rows + [[]] * (height - len(rows))
+        return [
+            tuple(None if value == "" else value for value in row[:width])
+            + (None,) * (width - len(row))
+            for row in rows[:height]
+        ]
+
+    async def get_preview(self, sheet_name: str) -> dict:
+        """
+        Get preview of the sheet made from its first rows.
+
+        The sheet grid may be much bigger than its data, so the row count is
+        unknown (None) until the sheet profile is built, the grid size is
+        reported as max_row_count. Sheets with the grid within the preview rows
+        have the exact row count.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            dict: preview with keys: row_count, max_row_count, column_count, columns,
+                preview_rows, data_types.
+        """
+        if sheet_name not in self._previews:
+            rows = await self.read_range(sheet_name, None, 1, None, PREVIEW_ROWS + 1)
+            header = list(rows[0]) if rows else []
+            while header and header[-1] is None:
+                header.pop()
+            columns = _column_names(header)
+            records = [row[: len(columns)] for row in rows[1:]]
+            max_row_count = max(self._sheets[sheet_name]["row_count"] - 1, 0)
+            row_count = None
+            if max_row_count <= PREVIEW_ROWS:
+                # The whole grid is read, trailing empty rows are not data.
+                while records and all(value is None for value in records[-1]):
+                    records.pop()
+                row_count = len(records)
+            head = pd.DataFrame.from_records(records, columns=columns)
+            self._previews[sheet_name] = {
+                "row_count": row_count,
+                "max_row_count": max_row_count,
+                "column_count": len(head.columns),
+                "columns": [str(column) for column in head.columns],
+                "preview_rows": preview_rows(head),
+                "data_types": {str(column): str(dtype) for column, dtype in head.dtypes.items()},
+            }
+        return self._previews[sheet_name]
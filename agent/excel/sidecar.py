@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from agent.constants import LOG_LEVEL
+
+logger = getLogger("excel")
+logger.setLevel(LOG_LEVEL)
+
+
+def file_revision(file_path: str) -> str:
+    """
+    Makes revision key of the local file from its size and modification time.
+
+    Args:
+        file_path (str): path to file.
+
+    Returns:
+        str: revision key.
+    """
+    stat = Path(file_path).stat()
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+class SidecarCache:
+    """
+    Columnar copies of workbook sheets, stored next to the cached excel file.
+
+    Every parsed sheet is written to an uncompressed Arrow IPC file, so later
+    sessions memory-map it instead of parsing the excel file again. Sidecars are
+    keyed by file name (Google Drive file id) and revision of the file.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, file_path: str, revision: str = None):
+        """
+        Initialize SidecarCache.
+
+        Args:
+            file_path (str): path to excel file.
+            revision (str, optional): revision of the file. Defaults to revision made from file stat.
+        """
+        file_path = Path(file_path)
+        self.revision = revision or file_revision(file_path)
+        self.directory = file_path.parent / f"{file_path.stem}.{self.revision}.sidecar"
+        self._manifest = None
+
+    @property
+    def manifest(self) -> dict:
+        """Sidecar manifest with keys: sheets, files."""
+        if self._manifest is None:
+            try:
+                with open(self.directory / self.MANIFEST, "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._manifest = {"sheets": None, "files": {}}
+        return self._manifest
+
+    def reload(self) -> None:
+        """Drops the manifest read before, so sidecars written by other processes are seen."""
+        self._manifest = None
+
+    def has_sheet(self, sheet_name: str) -> bool:
+        """Returns True if the sheet is stored to sidecar."""
+        return sheet_name in self.manifest["files"]
+
+    @property
+    def sheet_names(self) -> list[str] | None:
+        """Sheet names of the workbook if they were saved before."""
+        return self.manifest["sheets"]
+
+    @sheet_names.setter
+    def sheet_names(self, sheet_names: list[str]) -> None:
+        self.manifest["sheets"] = list(sheet_names)
+        try:
+            self._save_manifest()
+        except OSError as exc:
+            logger.warning("Sidecar manifest is not saved: %s", exc)
+
+    def load(self, sheet_name: str) -> pd.DataFrame | None:
+        """
+        Loads the sheet from memory-mapped sidecar file.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            pd.DataFrame | None: sheet data or None if there is no sidecar for the sheet.
+        """
+        file_name = self.manifest["files"].get(sheet_name)
+        if file_name is None:
+            return None
+        try:
+            with pa.memory_map(str(self.directory / file_name)) as source:
+                table = pa.ipc.open_file(source).read_all()
+            return table.to_pandas()
+        except (OSError, pa.ArrowInvalid) as exc:
+            logger.warning("Broken sidecar for sheet %s: %s", sheet_name, exc)
+            return None
+
+    def save(self, sheet_name: str, df: pd.DataFrame) -> bool:
+        """
+        Saves the sheet to sidecar file.
+
+        Sheets which can not be stored without changes (not string column names,
+        columns with mixed types) are skipped.
+
+        Args:
+            sheet_name (str): sheet name.
+            df (pd.DataFrame): sheet data.
+
+        Returns:
+            bool: True if the sheet was saved.
+        """
+        if not all(isinstance(column, str) for column in df.columns):
+            logger.debug("Sheet %s has not string column names, no sidecar", sheet_name)
+            return False
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as exc:
+            logger.debug("Sheet %s can not be stored to sidecar: %s", sheet_name, exc)
+            return False
+
+        file_name = self._file_name(sheet_name, ".arrow")
+        tmp_path = self.directory / f"{file_name}.tmp"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, self.directory / file_name)
+            # Other processes may have stored other sheets since the manifest was read.
+            self.reload()
+            self.manifest["files"][sheet_name] = file_name
+            self._save_manifest()
+        except OSError as exc:
+            logger.warning("Sidecar for sheet %s is not saved: %s", sheet_name, exc)
+            return False
+        return True
+
+    def load_profile(self, sheet_name: str) -> dict | None:
+        """
+        Loads the sheet profile.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            dict | None: sheet profile or None if it was not saved before.
+        """
+        try:
+            with open(
+                self.directory / self._file_name(sheet_name, ".profile.json"),
+                "r",
+                encoding="utf-8",
+            ) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_profile(self, sheet_name: str, profile: dict) -> None:
+        """
+        Saves the sheet profile.
+
+        Args:
+            sheet_name (str): sheet name.
+            profile (dict): JSON serializable sheet profile.
+        """
+        file_name = self._file_name(sheet_name, ".profile.json")
+        tmp_path = self.directory / f"{file_name}.tmp"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False)
+            os.replace(tmp_path, self.directory / file_name)
+        except OSError as exc:
+            logger.warning("Profile for sheet %s is not saved: %s", sheet_name, exc)
+
+    @staticmethod
+    def _file_name(sheet_name: str, suffix: str) -> str:
+        """Makes file name for sheet data, safe for any sheet name."""
+        return f"{hashlib.md5(sheet_name.encode()).hexdigest()[:16]}{suffix}"
+
+    def _save_manifest(self) -> None:
+        """Atomically writes the manifest to the sidecar directory."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f"{self.MANIFEST}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.directory / self.MANIFEST)
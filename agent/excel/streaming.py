@@ -0,0 +1,380 @@
+import re
+from collections import Counter
+from collections.abc import Iterator
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from agent.constants import EXCEL_STREAMING_CHUNK_ROWS
+from agent.excel.profile import MOST_COMMON_VALUES, PROFILE_VERSION, preview_rows
+from agent.excel.workbook import Workbook, pad_rows
+
+MAX_TRACKED_VALUES = 100_000
+MEDIAN_SAMPLE_SIZE = 10_000
+
+
+def _column_names(header: tuple) -> list:
+    """Makes column names from the header row the same way as pandas does."""
+    names = []
+    seen = {}
+    for position, value in enumerate(header):
+        name = f"Unnamed: {position}" if value is None or value == "" else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+class ColumnStats:
+    """
+    Statistics of one column, accumulated over row chunks with bounded memory.
+
+    Mean and std are exact, median is computed over a uniform sample of values,
+    distinct values are counted exactly up to MAX_TRACKED_VALUES.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self._rng = rng
+        self.null_count = 0
+        self.numeric = True
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._sample = np.empty(0)
+        self._sample_keys = np.empty(0)
+        self.values = Counter()
+        self.overflow = False
+
+    def update(self, column: pd.Series) -> None:
+        """
+        Adds chunk of the column to statistics.
+
+        Args:
+            column (pd.Series): chunk of the column.
+        """
+        non_null = column.dropna()
+        self.null_count += len(column) - len(non_null)
+        if non_null.empty:
+            return
+
+        self.values.update(non_null.value_counts().to_dict())
+        if len(self.values) > MAX_TRACKED_VALUES:
+            self.overflow = True
+            self.values = Counter(dict(self.values.most_common(MAX_TRACKED_VALUES)))
+
+        if not self.numeric or not pd.api.types.is_numeric_dtype(non_null):
+            self.numeric = False
+            return
+        values = non_null.to_numpy(dtype=float)
+        # Chan et al. parallel update of mean and sum of squared deviations.
+        n, mean = len(values), values.mean()
+        delta = mean - self.mean
+        total = self.n + n
+        self.m2 += ((values - mean) ** 2).sum() + delta**2 * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        # Bottom-k by random keys keeps a uniform sample of all values.
+        keys = np.concatenate([self._sample_keys, self._rng.random(n)])
+        sample = np.concatenate([self._sample, values])
+        if len(keys) > MEDIAN_SAMPLE_SIZE:
+            keep = np.argpartition(keys, MEDIAN_SAMPLE_SIZE)[:MEDIAN_SAMPLE_SIZE]
+            keys, sample = keys[keep], sample[keep]
+        self._sample_keys, self._sample = keys, sample
+
+    def result(self, count: int) -> dict:
+        """
+        Makes statistics in the format of `build_profile`.
+
+        Args:
+            count (int): count of rows in the sheet.
+
+        Returns:
+            dict: column statistics, approximate values are listed by `approximate` key.
+        """
+        stats = {
+            "count": count,
+            "null_count": self.null_count,
+            "unique_values": len(self.values),
+        }
+        approximate = []
+        if self.overflow:
+            approximate.append("unique_values")
+        if self.numeric and self.n:
+            stats.update(
+                {
+                    "min": float(self.min),
+                    "max": float(self.max),
+                    "mean": float(self.mean),
+                    "median": float(np.median(self._sample)),
+                    "std": float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else float("nan"),
+                }
+            )
+            if self.n > len(self._sample):
+                approximate.append("median")
+        else:
+            stats["most_common_values"] = {
+                str(k): int(v) for k, v in self.values.most_common(MOST_COMMON_VALUES)
+            }
+            if self.overflow:
+                approximate.append("most_common_values")
+        if approximate:
+            stats["approximate"] = approximate
+        return stats
+
+
+class StreamingWorkbook(Workbook):
+    """
+    Excel file read by row chunks with bounded memory.
+
+    Sheets are never loaded whole: preview is made from the first chunk, search
+    and profiles run over chunks of rows, cells are read by the streaming
+    openpyxl parser. Memory use depends on chunk size, not on sheet size.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        revision: str = None,
+        use_sidecar: bool = True,
+        pool=None,
+        chunk_rows: int = EXCEL_STREAMING_CHUNK_ROWS,
+    ):
+        """
+        Initialize StreamingWorkbook.
+
+        Args:
+            file_path (str): path to file.
+            revision (str, optional): revision of the file for sidecar cache keys.
+            use_sidecar (bool, optional): if True, profiles are stored to sidecar cache.
+            pool (ReaderPool, optional): memory pool, not used by streaming workbooks.
+            chunk_rows (int, optional): count of rows in one chunk.
+        """
+        super().__init__(file_path, revision, use_sidecar, pool)
+        self.chunk_rows = chunk_rows
+        self._row_counts = {}
+        self._previews = {}
+
+    @property
+    def book(self):
+        """Lazy loading read-only openpyxl workbook."""
+        if self._book is None:
+            self._book = load_workbook(self.file_path, read_only=True, data_only=True)
+        return self._book
+
+    def _read_sheet_names(self) -> list[str]:
+        """Reads sheet names from the file."""
+        return self.book.sheetnames
+
+    def _worksheet(self, sheet_name: str):
+        """Get read-only worksheet, its dimensions are not trusted for reading."""
+        ws = self.book[sheet_name]
+        if sheet_name not in self._row_counts:
+            self._row_counts[sheet_name] = ws.max_row
+            ws.reset_dimensions()
+        return ws
+
+    def iter_chunks(self, sheet_name: str, start: int = 0) -> Iterator[tuple[int, pd.DataFrame]]:
+        """
+        Reads the sheet by chunks of rows, the first row is a header.
+
+        Trailing empty rows are skipped, cells outside of the header width are ignored.
+
+        Args:
+            sheet_name (str): sheet name.
+            start (int): position of the first data row to read. Defaults to 0.
+
+        Yields:
+            tuple[int, pd.DataFrame]: position of the first chunk row and chunk data.
+        """
+        Workbook.parse_count += 1
+        rows = self._worksheet(sheet_name).iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        while header and header[-1] is None:
+            header.pop()
+        columns = _column_names(header)
+        width = len(columns)
+
+        position = start
+        chunk = []
+        empty_rows = 0
+        for row in islice(rows, start, None):
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if all(value is None for value in row):
+                empty_rows += 1
+                continue
+            chunk.extend([(None,) * width] * empty_rows)
+            empty_rows = 0
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                yield position, pd.DataFrame.from_records(chunk, columns=columns)
+                position += len(chunk)
+                chunk = []
+        if chunk:
+            yield position, pd.DataFrame.from_records(chunk, columns=columns)
+
+    def get_preview(self, sheet_name: str) -> dict:
+        """
+        Get preview of the sheet made from the first chunk.
+
+        Row count is taken from the sheet dimensions until the sheet profile is built.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            dict: preview with keys: row_count, column_count, columns, preview_rows, data_types.
+        """
+        if self._load_profile(sheet_name) is not None:
+            return super().get_preview(sheet_name)
+        if sheet_name not in self._previews:
+            _, head = next(self.iter_chunks(sheet_name), (0, pd.DataFrame()))
+            max_row = self._row_counts[sheet_name]
+            self._previews[sheet_name] = {
+                "row_count": max_row - 1 if max_row else len(head),
+                "column_count": len(head.columns),
+                "columns": [str(column) for column in head.columns],
+                "preview_rows": preview_rows(head),
+                "data_types": {
+                    str(column): str(dtype) for column, dtype in head.dtypes.items()
+                },
+            }
+        return self._previews[sheet_name]
+
+    def _build_profile(self, sheet_name: str) -> dict:
+        """Builds profile of the sheet with one pass over its chunks."""
+        rng = np.random.default_rng(0)
+        columns = {}
+        head = None
+        row_count = 0
+        for _, chunk in self.iter_chunks(sheet_name):
+            if head is None:
+                head = chunk
+                columns = {column: ColumnStats(rng) for column in chunk.columns}
+            for column, stats in columns.items():
+                stats.update(chunk[column])
+            row_count += len(chunk)
+        if head is None:
+            head = pd.DataFrame()
+
+        return {
+            "version": PROFILE_VERSION,
+            "row_count": row_count,
+            "column_count": len(head.columns),
+            "columns": [str(column) for column in head.columns],
+            "data_types": {str(column): str(dtype) for column, dtype in head.dtypes.items()},
+            "preview_rows": preview_rows(head),
+            "stats": {
+                str(column): stats.result(row_count) for column, stats in columns.items()
+            },
+        }
+
+    def search(
+        self,
+        sheet_name: str,
+        term: str,
+        match: str = "contains",
+        case_sensitive: bool = False,
+        after: int = -1,
+        limit: int = 10,
+    ) -> tuple[list[tuple[int, list, dict]], int, bool, bool]:
+        """
+        Finds one page of rows with matching text cells by scanning chunks.
+
+        The scan stops after the page is filled, so the total is the count of
+        matched rows between the page start and the end of the scan, and it is
+        exact only for the whole scan of the sheet.
+
+        Args:
+            sheet_name (str): sheet name.
+            term (str): search term, it is treated as a literal string.
+            match (str): one of "contains", "prefix", "exact".
+            case_sensitive (bool): if True, letter case must match.
+            after (int): row position after which the page starts. Defaults to -1.
+            limit (int): max count of rows in the page. Defaults to 10.
+
+        Returns:
+            tuple: page of matched rows as (row position, matched columns, row values),
+            total count of matched rows, flag if the total is exact and flag if
+            there are more rows after the page.
+        """
+        term = term if case_sensitive else term.lower()
+        if match == "prefix":
+            prefix = re.compile(
+                (r"(?<!\w)" if re.match(r"\w", term) else "^") + re.escape(term)
+            )
+
+        page = []
+        total = 0
+        for position, chunk in self.iter_chunks(sheet_name, after + 1):
+            matched = {}
+            for column in chunk.columns:
+                if chunk[column].dtype != "object":
+                    continue
+                values = chunk[column].dropna().astype(str)
+                if not case_sensitive:
+                    values = values.str.lower()
+                if match == "exact":
+                    mask = values == term
+                elif match == "prefix":
+                    mask = values.str.contains(prefix)
+                else:
+                    mask = values.str.contains(term, regex=False)
+                matched[column] = mask.reindex(chunk.index, fill_value=False)
+            if not matched:
+                continue
+            matched = pd.DataFrame(matched)
+            rows = np.flatnonzero(matched.to_numpy().any(axis=1))
+            total += len(rows)
+            for row in rows:
+                if len(page) == limit:
+                    return page, total, False, True
+                page.append(
+                    (
+                        position + int(row),
+                        matched.columns[matched.iloc[row].to_numpy()].tolist(),
+                        chunk.iloc[row].to_dict(),
+                    )
+                )
+        return page, total, after < 0, False
+
+    def read_range(
+        self, sheet_name: str, min_col: int, min_row: int, max_col: int, max_row: int
+    ) -> list[tuple]:
+        """
+        Reads cell values of the rectangular range by the streaming parser.
+
+        Args:
+            sheet_name (str): sheet name.
+            min_col (int): first column, None means the first column of the sheet.
+            min_row (int): first row, None means the first row of the sheet.
+            max_col (int): last column, None means the last column with data in the row.
+            max_row (int): last row, None means the last row of the sheet.
+
+        Returns:
+            list[tuple]: rows of cell values, explicit bounds are padded with empty cells.
+        """
+        Workbook.parse_count += 1
+        rows = list(
+            self._worksheet(sheet_name).iter_rows(
+                min_row=min_row,
+                max_row=max_row,
+                min_col=min_col,
+                max_col=max_col,
+                values_only=True,
+            )
+        )
+        # Cells after the end of the sheet are empty, as in the in-memory workbook.
+        return pad_rows(
+            rows,
+            max_col - (min_col or 1) + 1 if max_col else None,
+            max_row - (min_row or 1) + 1 if max_row else None,
+        )
@@ -0,0 +1,432 @@
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from agent.excel.profile import PROFILE_VERSION, build_profile
+from agent.excel.search_index import SheetIndex
+from agent.excel.sidecar import SidecarCache
+
+# Rough memory size of a parsed openpyxl cell, books are counted by the pool with it.
+CELL_SIZE = 400
+
+
+def pad_rows(rows: list[tuple], width: int, height: int) -> list[tuple]:
+    """
+    Pads rows of cell values with empty cells to the range size.
+
+    Args:
+        rows (list[tuple]): rows of cell values, they may be shorter than the range.
+        width (int): count of range columns, None keeps the row lengths.
+        height (int): count of range rows, None keeps the count of rows.
+
+    Returns:
+        list[tuple]: rows of the range size.
+    """
+    if width is not None:
+        rows = [tuple(row) + (None,) * (width - len(row)) for row in rows]
+    if height is not None:
+        rows = rows + [(None,) * (width or 0)] * (height - len(rows))
+    return rows
+
+
+class Workbook:
+    """
+    Parsed excel file shared by pandas and openpyxl operations.
+
+    The file is parsed once on first access, the same openpyxl workbook is used
+    for cell access and as a source for pandas dataframes. Parsed sheets are
+    stored to the sidecar cache, so the next workbook for the same file revision
+    reads them without parsing the file.
+
+    Attributes:
+        parse_count (int): count of excel file parses made by all instances,
+            passes of streaming workbooks over sheet data included.
+    """
+
+    parse_count = 0
+
+    def __init__(
+        self, file_path: str, revision: str = None, use_sidecar: bool = True, pool=None
+    ):
+        """
+        Initialize Workbook.
+
+        Args:
+            file_path (str): path to file.
+            revision (str, optional): revision of the file for sidecar cache keys.
+            use_sidecar (bool, optional): if True, sheets are read from and stored to sidecar cache.
+            pool (ReaderPool, optional): memory pool which evicts loaded sheets and indexes.
+        """
+        self.file_path = file_path
+        self.pool = pool
+        self.sidecar = SidecarCache(file_path, revision) if use_sidecar else None
+        self._book = None
+        self._read_only_book = None
+        self._excel_file = None
+        self._dataframes = {}
+        self._search_indexes = {}
+        self._profiles = {}
+        self._lock = threading.RLock()
+
+    @property
+    def book(self):
+        """Lazy loading openpyxl workbook for cell operations."""
+        book = self._book
+        if book is not None:
+            if self.pool:
+                self.pool.hit(self, "book", None)
+            return book
+        with self._lock:
+            book = self._book
+            if book is not None:
+                return book
+            book = load_workbook(self.file_path, data_only=True)
+            Workbook.parse_count += 1
+            # Reads don't create cells, so the size of the book doesn't change.
+            nbytes = sum(len(ws._cells) for ws in book.worksheets) * CELL_SIZE
+            if self.pool and not self.pool.fits(nbytes):
+                # The book would evict all cached data, so it is used by the caller
+                # only and cells are read by the read-only book.
+                return book
+            self._book = book
+            # Cells are read from the parsed book from now on.
+            self._read_only_book = None
+        if self.pool:
+            self.pool.add(self, "book", None, nbytes)
+        return book
+
+    @property
+    def excel_file(self) -> pd.ExcelFile:
+        """Lazy loading pandas excel file built over the parsed workbook."""
+        excel_file = self._excel_file
+        if excel_file is None:
+            with self._lock:
+                if self._excel_file is None:
+                    if Path(self.file_path).suffix == ".xls":
+                        # openpyxl doesn't support old format, so it is parsed by pandas itself.
+                        self._excel_file = pd.ExcelFile(self.file_path)
+                        Workbook.parse_count += 1
+                    else:
+                        book = self.book
+                        excel_file = pd.ExcelFile(book, engine="openpyxl")
+                        if book is not self._book:
+                            # The book is too big to be kept, the excel file is not kept too.
+                            return excel_file
+                        self._excel_file = excel_file
+                excel_file = self._excel_file
+        return excel_file
+
+    @property
+    def sheet_names(self) -> list[str]:
+        """Names of the workbook sheets."""
+        if self.sidecar is None:
+            return self._read_sheet_names()
+        with self._lock:
+            if self.sidecar.sheet_names is None:
+                self.sidecar.sheet_names = self._read_sheet_names()
+            return self.sidecar.sheet_names
+
+    def _read_sheet_names(self) -> list[str]:
+        """Reads sheet names from the file, without parsing sheets if possible."""
+        if self._excel_file is not None or Path(self.file_path).suffix == ".xls":
+            return self.excel_file.sheet_names
+        book = load_workbook(self.file_path, read_only=True)
+        try:
+            return book.sheetnames
+        finally:
+            book.close()
+
+    def get_dataframe(self, sheet_name: str) -> pd.DataFrame:
+        """
+        Get dataframe of the sheet, parsed from the shared workbook.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            pd.DataFrame: sheet data.
+        """
+        df = self._dataframes.get(sheet_name)
+        if df is not None:
+            if self.pool:
+                self.pool.hit(self, "sheet", sheet_name)
+            return df
+
+        with self._lock:
+            df = self._dataframes.get(sheet_name)
+            if df is not None:
+                return df
+            df = self.sidecar.load(sheet_name) if self.sidecar else None
+            if df is None:
+                df = self.excel_file.parse(sheet_name)
+                if self.sidecar:
+                    self.sidecar.save(sheet_name, df)
+        self.put_dataframe(sheet_name, df)
+        return df
+
+    def put_dataframe(self, sheet_name: str, df: pd.DataFrame) -> None:
+        """
+        Stores loaded dataframe of the sheet.
+
+        Args:
+            sheet_name (str): sheet name.
+            df (pd.DataFrame): sheet data.
+        """
+        self._dataframes[sheet_name] = df
+        # Pool may evict data of other workbooks, so it is called without the lock.
+        if self.pool:
+            self.pool.add(self, "sheet", sheet_name, int(df.memory_usage(deep=True).sum()))
+
+    def has_sheet_data(self, sheet_name: str) -> bool:
+        """
+        Checks if the sheet can be read without parsing the file.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            bool: True if the sheet is loaded or stored to sidecar cache.
+        """
+        return sheet_name in self._dataframes or bool(
+            self.sidecar and self.sidecar.has_sheet(sheet_name)
+        )
+
+    def get_search_index(self, sheet_name: str) -> SheetIndex:
+        """
+        Get search index of the sheet, it is built on first request.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            SheetIndex: search index of the sheet.
+        """
+        index = self._search_indexes.get(sheet_name)
+        if index is not None:
+            if self.pool:
+                self.pool.hit(self, "index", sheet_name)
+            return index
+
+        df = self.get_dataframe(sheet_name)
+        with self._lock:
+            index = self._search_indexes.get(sheet_name)
+            if index is not None:
+                return index
+            index = SheetIndex(df)
+            self._search_indexes[sheet_name] = index
+        if self.pool:
+            self.pool.add(self, "index", sheet_name, index.nbytes)
+        return index
+
+    def evict(self, kind: str, sheet_name: str) -> None:
+        """
+        Drops cached data of the sheet, it will be loaded again on the next access.
+
+        Args:
+            kind (str): kind of the data, "sheet", "index" or "book".
+            sheet_name (str): sheet name.
+        """
+        if kind == "book":
+            # Pandas excel file is built over the book, so it is dropped too.
+            self._book = None
+            self._read_only_book = None
+            self._excel_file = None
+            return
+        cache = self._dataframes if kind == "sheet" else self._search_indexes
+        cache.pop(sheet_name, None)
+
+    def release(self) -> None:
+        """Drops parsed file, it will be parsed again on the next access."""
+        self._book = None
+        self._read_only_book = None
+        self._excel_file = None
+
+    def get_profile(self, sheet_name: str) -> dict:
+        """
+        Get profile of the sheet with preview and statistics of all columns.
+
+        The profile is built once per file revision and stored to sidecar cache.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            dict: sheet profile, see `build_profile`.
+        """
+        profile = self._load_profile(sheet_name)
+        if profile is None:
+            with self._lock:
+                profile = self._load_profile(sheet_name)
+                if profile is None:
+                    profile = self._build_profile(sheet_name)
+                    if self.sidecar:
+                        self.sidecar.save_profile(sheet_name, profile)
+                    self._profiles[sheet_name] = profile
+        return profile
+
+    def has_profile(self, sheet_name: str) -> bool:
+        """
+        Checks if the sheet profile was built before.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            bool: True if the profile is in memory or in sidecar cache.
+        """
+        return self._load_profile(sheet_name) is not None
+
+    def _load_profile(self, sheet_name: str) -> dict | None:
+        """Loads profile of the sheet from memory or sidecar cache if it was built before."""
+        if sheet_name not in self._profiles:
+            profile = self.sidecar.load_profile(sheet_name) if self.sidecar else None
+            if profile is None or profile.get("version") != PROFILE_VERSION:
+                return None
+            self._profiles[sheet_name] = profile
+        return self._profiles[sheet_name]
+
+    def _build_profile(self, sheet_name: str) -> dict:
+        """Builds profile of the sheet from its dataframe."""
+        return build_profile(self.get_dataframe(sheet_name))
+
+    def get_preview(self, sheet_name: str) -> dict:
+        """
+        Get preview of the sheet.
+
+        Args:
+            sheet_name (str): sheet name.
+
+        Returns:
+            dict: preview with keys: row_count, column_count, columns, preview_rows, data_types.
+        """
+        profile = self.get_profile(sheet_name)
+        return {
+            key: profile[key]
+            for key in ("row_count", "column_count", "columns", "preview_rows", "data_types")
+        }
+
+    def search(
+        self,
+        sheet_name: str,
+        term: str,
+        match: str = "contains",
+        case_sensitive: bool = False,
+        after: int = -1,
+        limit: int = 10,
+    ) -> tuple[list[tuple[int, list, dict]], int, bool, bool]:
+        """
+        Finds one page of rows with matching text cells, see `SheetIndex.search`.
+
+        Args:
+            sheet_name (str): sheet name.
+            term (str): search term, it is treated as a literal string.
+            match (str): one of "contains", "prefix", "exact".
+            case_sensitive (bool): if True, letter case must match.
+            after (int): row position after which the page starts. Defaults to -1.
+            limit (int): max count of rows in the page. Defaults to 10.
+
+        Returns:
+            tuple: page of matched rows as (row position, matched columns, row values),
+            total count of matched rows, flag if the total is exact and flag if
+            there are more rows after the page.
+        """
+        page, total, is_exact, has_more = self.get_search_index(sheet_name).search(
+            term, match, case_sensitive, after, limit
+        )
+        records = (
+            self.get_dataframe(sheet_name)
+            .iloc[[row for row, _ in page]]
+            .to_dict(orient="records")
+        )
+        page = [(row, columns, values) for (row, columns), values in zip(page, records)]
+        return page, total, is_exact, has_more
+
+    def read_range(
+        self, sheet_name: str, min_col: int, min_row: int, max_col: int, max_row: int
+    ) -> list[tuple]:
+        """
+        Reads cell values of the rectangular range, bounds are 1-based and inclusive.
+
+        Args:
+            sheet_name (str): sheet name.
+            min_col (int): first column, None means the first column of the sheet.
+            min_row (int): first row, None means the first row of the sheet.
+            max_col (int): last column, None means the last column of the sheet.
+            max_row (int): last row, None means the last row of the sheet.
+
+        Returns:
+            list[tuple]: rows of cell values.
+        """
+        min_row, min_col = min_row or 1, min_col or 1
+        book = self._book
+        if book is not None:
+            # Cells are taken from the parsed sheet without openpyxl accessors,
+            # they would create missing cells in the book shared by other threads.
+            ws = book[sheet_name]
+            last_row, last_col = ws.max_row, ws.max_column
+            max_row = last_row if max_row is None else max_row
+            max_col = last_col if max_col is None else max_col
+            cells = ws._cells
+            rows = [
+                tuple(
+                    getattr(cells.get((row, column)), "value", None)
+                    for column in range(min_col, min(max_col, last_col) + 1)
+                )
+                for row in range(min_row, min(max_row, last_row) + 1)
+            ]
+        else:
+            # The file is not parsed in this process, the range is read by the streaming parser.
+            rows, max_row, max_col = self._stream_range(
+                sheet_name, min_col, min_row, max_col, max_row
+            )
+        return pad_rows(rows, max_col - min_col + 1, max_row - min_row + 1)
+
+    def _stream_range(
+        self, sheet_name: str, min_col: int, min_row: int, max_col: int, max_row: int
+    ) -> tuple[list[tuple], int, int]:
+        """
+        Reads the range from the file by the read-only parser.
+
+        The read-only book keeps only shared strings in memory, the sheet is
+        parsed up to the last row of the range on each read.
+
+        Returns:
+            tuple[list[tuple], int, int]: rows of cell values, last row and last column of the range.
+        """
+        book = self._read_only_book
+        if book is not None:
+            if self.pool:
+                self.pool.hit(self, "book", None)
+        else:
+            with self._lock:
+                book = self._read_only_book
+                if book is None:
+                    book = self._read_only_book = load_workbook(
+                        self.file_path, read_only=True, data_only=True
+                    )
+                    if self.pool:
+                        self.pool.add(
+                            self, "book", None, sum(map(sys.getsizeof, book.shared_strings))
+                        )
+        Workbook.parse_count += 1
+        ws = book[sheet_name]
+        max_row = ws.max_row if max_row is None else max_row
+        max_col = ws.max_column if max_col is None else max_col
+        rows = list(
+            ws.iter_rows(
+                min_row=min_row,
+                max_row=max_row,
+                min_col=min_col,
+                max_col=max_col,
+                values_only=True,
+            )
+        )
+        # Files without dimensions are read up to the last row with data.
+        if max_row is None:
+            max_row = min_row + len(rows) - 1
+        if max_col is None:
+            max_col = min_col + max(map(len, rows), default=0) - 1
+        return rows, max_row, max_col
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+
+from agent.constants import TOOL_OUTPUT_MAX_ROWS, TOOL_OUTPUT_MAX_TEXT
+
+
+def _default(value):
+    """Converts values which are not JSON serializable."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _cap(value, path: str, notes: dict):
+    """Cuts long lists and texts of the value, notes about cuts are collected by path."""
+    if isinstance(value, str):
+        if len(value) > TOOL_OUTPUT_MAX_TEXT:
+            notes.setdefault(
+                ("text", path), f"{path}: texts are cut to {TOOL_OUTPUT_MAX_TEXT} characters"
+            )
+            return value[:TOOL_OUTPUT_MAX_TEXT] + "…"
+        return value
+    if isinstance(value, dict):
+        return {key: _cap(item, str(key), notes) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > TOOL_OUTPUT_MAX_ROWS:
+            notes.setdefault(
+                ("list", path), f"{path}: first {TOOL_OUTPUT_MAX_ROWS} of {len(value)} items are shown"
+            )
+        return [_cap(item, path, notes) for item in value[:TOOL_OUTPUT_MAX_ROWS]]
+    return value
+
+
+def encode_tool_result(result) -> str:
+    """
+    Encodes tool result for the prompt as compact JSON.
+
+    Lists longer than TOOL_OUTPUT_MAX_ROWS and texts longer than
+    TOOL_OUTPUT_MAX_TEXT are cut, the cuts are listed in the "truncated" key
+    of the result, or in the note after a text result.
+
+    Args:
+        result: result of the tool.
+
+    Returns:
+        str: encoded result.
+    """
+    notes = {}
+    result = _cap(result, "result", notes)
+    if isinstance(result, str):
+        if notes:
+            result += f"\n[truncated: {'; '.join(notes.values())}]"
+        return result
+    if notes:
+        result = {**result, "truncated": list(notes.values())} if isinstance(result, dict) else {
+            "result": result, "truncated": list(notes.values())
+        }
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=_default)
@@ -0,0 +1,73 @@
+from logging import getLogger
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from agent.constants import (HISTORY_MIN_MESSAGES, HISTORY_SUMMARY_TOKENS,
+                             HISTORY_TOKEN_BUDGET, LOG_LEVEL)
+from agent.exceptions import LLMError
+from agent.graph.models import State
+from agent.llm.models import LLMAgent
+from agent.llm.prompts import HISTORY_CONTEXT_PROMPT, HISTORY_SUMMARY_PROMPT
+from agent.llm.tokens import count_tokens, message_tokens
+
+logger = getLogger("history")
+logger.setLevel(LOG_LEVEL)
+
+
+def _keep_count(history: list[BaseMessage], budget: int) -> int:
+    """Count of the latest messages which fit the budget, but not less than the minimum."""
+    keep = 0
+    for message in reversed(history):
+        budget -= message_tokens(message)
+        if budget < 0:
+            break
+        keep += 1
+    return min(max(keep, HISTORY_MIN_MESSAGES, 1), len(history))
+
+
+async def _summarize(summary: str | None, messages: list[BaseMessage]) -> str | None:
+    """Folds the messages into the summary, the old summary is kept if LLM fails."""
+    transcript = "\n".join(f"{message.type}: {message.content}" for message in messages)
+    if summary:
+        transcript = f"Previous summary:\n{summary}\n\nNew messages:\n{transcript}"
+    try:
+        response = await LLMAgent(max_tokens=HISTORY_SUMMARY_TOKENS).call_model(
+            [SystemMessage(content=HISTORY_SUMMARY_PROMPT), HumanMessage(content=transcript)]
+        )
+    except LLMError as exc:
+        logger.warning("Old messages are dropped without summary: %s", exc)
+        return summary
+    return str(response.content).strip() or summary
+
+
+async def prompt_messages(state: State, system_message: SystemMessage) -> list[BaseMessage]:
+    """
+    Get messages of the prompt: system message, summary of old messages and the latest messages.
+
+    When the history with the summary exceeds HISTORY_TOKEN_BUDGET, older
+    messages are folded into the rolling summary stored in the state and are
+    removed from the history. The history is cut to half of the budget, so
+    the summary is updated once per several turns.
+
+    Args:
+        state (State): state of the user, its history and summary may be changed.
+        system_message (SystemMessage): system prompt of the node.
+
+    Returns:
+        list[BaseMessage]: messages for LLM.
+    """
+    history = state["message_history"]
+    summary = state.get("history_summary")
+    summary_tokens = count_tokens([SystemMessage(content=summary)]) if summary else 0
+    if summary_tokens + count_tokens(history) > HISTORY_TOKEN_BUDGET:
+        keep = _keep_count(history, (HISTORY_TOKEN_BUDGET - HISTORY_SUMMARY_TOKENS) // 2)
+        if keep < len(history):
+            summary = await _summarize(summary, history[:-keep])
+            logger.info("%d old messages are folded into the summary", len(history) - keep)
+            history = state["message_history"] = history[-keep:]
+            state["history_summary"] = summary
+
+    messages = [system_message]
+    if summary:
+        messages.append(SystemMessage(content=HISTORY_CONTEXT_PROMPT.format(summary)))
+    return [*messages, *history]
@@ -8,12 +8,14 @@ class State(TypedDict):
 
     user_id: str
     message_history: list[BaseMessage]  # История сообщений
+    history_summary: Optional[str]  # Краткое содержание старых сообщений, убранных из истории
     current_response: Optional[str]  # Текущий ответ агента
 
     authenticated: bool  # Прошла ли аутентификация
     selected_file_id: Optional[str]  # ID выбранного файла
     selected_file_name: Optional[str]  # имя выбранного файла
     selected_file_path: Optional[str]  # путь к выбранному файлу
+    selected_file_checked: Optional[float]  # время последней проверки ревизии файла
 
     available_files: Optional[list[dict]]  # Список доступных файлов
 
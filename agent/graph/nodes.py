@@ -1,15 +1,21 @@
+import asyncio
+import time
 from logging import getLogger
 
-from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
 
-from agent.constants import LOG_LEVEL
+from agent.constants import FILE_QUESTIONS_SINGLE_PASS, LOG_LEVEL
 from agent.excel.readers_manager import Manager
 from agent.exceptions import GoogleDriveError, LLMError
 from agent.GD.requestor import GDRequestor
+from agent.graph.encoding import encode_tool_result
+from agent.graph.history import prompt_messages
 from agent.graph.models import State
-from agent.graph.tools import get_tools
+from agent.graph.prefetch import Prefetcher, find_candidate
+from agent.graph.tools import RESELECT_TOOL, get_tools, run_tool_calls
 from agent.llm.models import LLMAgent
 from agent.llm.prompts import (FILE_QUESTIONS_PROMPT,
+                               FILE_QUESTIONS_SINGLE_PASS_PROMPT,
                                FILE_QUESTIONS_TOOLS_USE_PROMPT,
                                FILE_SELECTION_PROMPT)
 
@@ -24,7 +30,7 @@ async def files_getting_node(state: State) -> State:
     """
     logger.debug("==========FILES GETTING NODE==========")
     try:
-        state["available_files"] = GDRequestor().list_files()
+        state["available_files"] = await GDRequestor().list_files()
     except GoogleDriveError as exc:
         state["error"] = str(exc)
         state["error_type"] = "GoogleDriveError"
@@ -46,10 +52,17 @@ async def file_selection_node(state: State) -> State:
         content=FILE_SELECTION_PROMPT.format(state["available_files"])
     )
 
-    messages = [system_message, *state["message_history"]]
+    candidate = find_candidate(
+        str(state["message_history"][-1].content), state["available_files"]
+    )
+    if candidate is not None:
+        Prefetcher.start(state["user_id"], candidate)
+
+    messages = await prompt_messages(state, system_message)
     try:
         response = await llm.call_model(messages)
     except LLMError as exc:
+        Prefetcher.cancel(state["user_id"])
         state["error"] = str(exc)
         state["error_type"] = "LLMError"
         return state
@@ -60,13 +73,16 @@ async def file_selection_node(state: State) -> State:
          and response["file_id"] not in map(lambda file: file["id"], state["available_files"])):
             state["error"] = f"{llm.model}: doesn't use response schema."
             state["error_type"] = "LLMError"
+            Prefetcher.cancel(state["user_id"])
             return state
         state["current_response"] = response["answer"]
         state["selected_file_id"] = response["file_id"]
         state["selected_file_name"] = response["file_name"]
+        Prefetcher.keep(state["user_id"], response["file_id"])
     except KeyError:
         state["error"] = f"{llm.model}: doesn't use response schema."
         state["error_type"] = "LLMError"
+        Prefetcher.cancel(state["user_id"])
     return state
 
 
@@ -76,28 +92,91 @@ async def file_downloading_node(state: State) -> State:
     """
     logger.debug("==========FILE DOWNLOADING NODE==========")
     try:
-        state["selected_file_path"] = GDRequestor().download_file(
-            state["selected_file_id"]
+        state["selected_file_path"] = await Prefetcher.download(
+            state["user_id"], state["selected_file_id"]
         )
     except GoogleDriveError as exc:
         state["error"] = str(exc)
         state["error_type"] = "GoogleDriveError"
+        return state
+    state["selected_file_checked"] = time.time()
+    # The first sheet is parsed while the file questions prompt is built.
+    Prefetcher.warm_up(
+        state["user_id"],
+        state["selected_file_name"],
+        state["selected_file_path"],
+        state["selected_file_id"],
+    )
     return state
 
 
+def _reset_selection(state: State) -> None:
+    """Forgets the selected file, the user selects a file again on the next message."""
+    state["selected_file_path"] = None
+    state["selected_file_checked"] = None
+    state["available_files"] = None
+    state["selected_file_id"] = None
+    state["selected_file_name"] = None
+
+
+async def _tools_loop(
+    state: State, llm: LLMAgent, tools: list, messages: list[BaseMessage]
+) -> BaseMessage | None:
+    """
+    Calls llm and runs its tool calls until llm answers without tools.
+
+    Tool calls and their results are appended to the messages.
+
+    Returns:
+        BaseMessage | None: last llm response, None if llm failed and the error is set to the state.
+    """
+    response = None
+    for _ in range(MAX_TOOLS_USAGE_RETRIES):
+        try:
+            response = await llm.call_model(messages)
+        except LLMError as exc:
+            state["error"] = str(exc)
+            state["error_type"] = "LLMError"
+            return None
+        if not response.tool_calls:
+            break
+        tool_results = await run_tool_calls(
+            tools, response.tool_calls, Manager.get_file_key(state["user_id"])
+        )
+        for tool_call, tool_result in zip(response.tool_calls, tool_results):
+            logger.debug("TOOL: %s", str(tool_call))
+            messages.append(AIMessage(content="", tool_calls=[tool_call]))
+            messages.append(
+                ToolMessage(
+                    content=encode_tool_result(tool_result), tool_call_id=tool_call["id"]
+                )
+            )
+    return response
+
+
 async def file_questions_node(state: State) -> State:
     """
     Node for handle the users questions about selected file content.
     """
     logger.debug("==========FILE QUESTIONS NODE==========")
+    excel_reader = Manager.get_reader(
+        state["user_id"],
+        state["selected_file_name"],
+        state["selected_file_path"],
+        state["selected_file_id"],
+    )
+    Prefetcher.finish(state["user_id"])
+
+    file_summary, sheet_preview = await asyncio.gather(
+        excel_reader.get_file_summary(), excel_reader.get_sheet_preview()
+    )
+    if FILE_QUESTIONS_SINGLE_PASS:
+        return await _answer_single_pass(state, file_summary, sheet_preview)
+
     schema = {
         "answer": "ответ пользователю",
         "reselect": "флаг для выбора другого файла",
     }
-    excel_reader = Manager.get_reader(
-        state["user_id"], state["selected_file_name"], state["selected_file_path"]
-    )
-
     llm = LLMAgent(schema=schema)
     tools = get_tools(state["user_id"])
     llm_with_tools = LLMAgent(tools=tools, tool_choice="auto")
@@ -105,43 +184,20 @@ async def file_questions_node(state: State) -> State:
     system_message = SystemMessage(
         content=FILE_QUESTIONS_TOOLS_USE_PROMPT.format(
             state["selected_file_name"],
-            await excel_reader.get_file_summary(),
-            await excel_reader.get_sheet_preview(),
+            encode_tool_result(file_summary),
+            encode_tool_result(sheet_preview),
         )
     )
 
-    messages = [system_message, *state["message_history"]]
-    for _ in range(MAX_TOOLS_USAGE_RETRIES):
-        try:
-            response = await llm_with_tools.call_model(messages)
-        except LLMError as exc:
-            state["error"] = str(exc)
-            state["error_type"] = "LLMError"
-            return state
-
-        intermediate_steps = []
-        if hasattr(response, "tool_calls"):
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-
-                tool = next(t for t in tools if t.name == tool_name)
-                tool_result = await (await tool.ainvoke(tool_args))
-                intermediate_steps.append((tool_call, tool_result))
-        else:
-            break
-        for tool_call, tool_result in intermediate_steps:
-            logger.debug("TOOL: %s", str(tool_call))
-            messages.append(AIMessage(content="", tool_calls=[tool_call]))
-            messages.append(
-                ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"])
-            )
+    messages = await prompt_messages(state, system_message)
+    if await _tools_loop(state, llm_with_tools, tools, messages) is None:
+        return state
 
     system_message = SystemMessage(
         content=FILE_QUESTIONS_PROMPT.format(
             state["selected_file_name"],
-            await excel_reader.get_file_summary(),
-            await excel_reader.get_sheet_preview(),
+            encode_tool_result(await excel_reader.get_file_summary()),
+            encode_tool_result(await excel_reader.get_sheet_preview()),
         )
     )
     messages[0] = system_message
@@ -159,16 +215,58 @@ async def file_questions_node(state: State) -> State:
             return state
         state["current_response"] = response["parsed"]["answer"]
         if response["parsed"]["reselect"]:
-            state["selected_file_path"] = None
-            state["available_files"] = None
-            state["selected_file_id"] = None
-            state["selected_file_name"] = None
+            _reset_selection(state)
     except KeyError:
         state["error"] = f"{llm.model}: doesn't use response schema."
         state["error_type"] = "LLMError"
     return state
 
 
+async def _answer_single_pass(state: State, file_summary: dict, sheet_preview: dict) -> State:
+    """
+    Answers the question by the tools loop, the last llm message is the answer.
+
+    The reselect decision is the reselect_file tool, so no separate
+    structured output call is made.
+    """
+    tools = [*get_tools(state["user_id"]), RESELECT_TOOL]
+    llm_with_tools = LLMAgent(tools=tools, tool_choice="auto")
+    system_message = SystemMessage(
+        content=FILE_QUESTIONS_SINGLE_PASS_PROMPT.format(
+            state["selected_file_name"],
+            encode_tool_result(file_summary),
+            encode_tool_result(sheet_preview),
+        )
+    )
+    messages = await prompt_messages(state, system_message)
+    start = len(messages)
+    response = await _tools_loop(state, llm_with_tools, tools, messages)
+    if response is None:
+        return state
+    if response.tool_calls:
+        # Tool calls are not finished in the limit of steps, the answer is made from their results.
+        try:
+            response = await LLMAgent(tools=tools, tool_choice="none").call_model(messages)
+        except LLMError as exc:
+            state["error"] = str(exc)
+            state["error_type"] = "LLMError"
+            return state
+
+    answer = str(response.content).strip()
+    if not answer:
+        state["error"] = f"{llm_with_tools.model}: doesn't answer."
+        state["error_type"] = "LLMError"
+        return state
+    state["current_response"] = answer
+    if any(
+        tool_call["name"] == RESELECT_TOOL.name
+        for message in messages[start:]
+        for tool_call in getattr(message, "tool_calls", [])
+    ):
+        _reset_selection(state)
+    return state
+
+
 async def error_handling_node(state: State) -> State:
     """
     Node for errors handling.
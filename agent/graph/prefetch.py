@@ -0,0 +1,198 @@
+import asyncio
+import re
+from logging import getLogger
+from pathlib import Path
+
+from agent.constants import FILE_PREFETCH, LOG_LEVEL
+from agent.excel.readers_manager import Manager
+from agent.GD.requestor import GDRequestor
+
+WORD = re.compile(r"\w+")
+EXCEL_EXTENSION = re.compile(r"\.(xlsx|xlsm|xls)$", re.IGNORECASE)
+# Shorter names match too many messages by chance.
+MIN_NAME_LENGTH = 4
+
+logger = getLogger("prefetch")
+logger.setLevel(LOG_LEVEL)
+
+
+def _name_words(file_name: str) -> set[str]:
+    """Words of the file name without extension."""
+    return set(WORD.findall(EXCEL_EXTENSION.sub("", file_name).lower()))
+
+
+def find_candidate(text: str, files: list[dict]) -> dict | None:
+    """
+    Finds the file which is surely named in the user message.
+
+    A file matches if all words of its name are in the message. The match is
+    confident only if it is unique, or if names of other matched files are
+    parts of its name ("report" and "report 2024" - the longer name wins).
+
+    Args:
+        text (str): user message.
+        files (list[dict]): available files in format `{"id": file_id, "name": file_name}`.
+
+    Returns:
+        dict | None: matched file or None if there is no confident match.
+    """
+    words = set(WORD.findall(text.lower()))
+    matched = []
+    for file in files:
+        name_words = _name_words(file["name"])
+        if name_words and sum(map(len, name_words)) >= MIN_NAME_LENGTH and name_words <= words:
+            matched.append((name_words, file))
+    if not matched:
+        return None
+    name_words, file = max(matched, key=lambda match: len(match[0]))
+    if any(other is not file and not other_words < name_words for other_words, other in matched):
+        return None
+    return file
+
+
+async def _download(file_id: str) -> Path:
+    """Downloads the file, old revisions opened by readers are kept."""
+    return await GDRequestor().download_file(file_id, Manager.is_in_use)
+
+
+class Prefetcher:
+    """
+    Speculative download and parse of the file before it is selected by LLM.
+
+    While the selection LLM call runs, the file found by the local prefilter is
+    downloaded, and its first sheet preview is prepared. If LLM selects
+    another file, the prefetch is cancelled and its reader is released.
+    Counters show how often the speculation was right.
+    """
+
+    _downloads = {}
+    _warmups = {}
+    started = 0
+    used = 0
+    cancelled = 0
+
+    @classmethod
+    def start(cls, user_id: str, file: dict) -> None:
+        """
+        Starts download and parse of the file in background.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            file (dict): file info in format `{"id": file_id, "name": file_name}`.
+        """
+        if not FILE_PREFETCH:
+            return
+        cls.cancel(user_id)
+        logger.debug("Prefetch of %s for user %s", file["name"], user_id)
+        cls.started += 1
+        task = asyncio.create_task(cls._prefetch(user_id, file))
+        task.add_done_callback(cls._log_failure)
+        cls._downloads[user_id] = (file["id"], task)
+
+    @classmethod
+    async def _prefetch(cls, user_id: str, file: dict) -> Path:
+        """Downloads the file and warms up its preview."""
+        file_path = await _download(file["id"])
+        cls.warm_up(user_id, file["name"], file_path, file["id"])
+        return file_path
+
+    @classmethod
+    def keep(cls, user_id: str, file_id: str | None) -> None:
+        """
+        Cancels prefetch of the user if LLM selected another file.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            file_id (str | None): id of the selected file, None if no file was selected.
+        """
+        entry = cls._downloads.get(user_id)
+        if entry and entry[0] != file_id:
+            cls.cancel(user_id)
+
+    @classmethod
+    def cancel(cls, user_id: str) -> None:
+        """
+        Cancels prefetch of the user and releases the prefetched reader.
+
+        Parses already sent to the process pool are finished, their results
+        stay in sidecar cache.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+        """
+        entry = cls._downloads.pop(user_id, None)
+        if entry is None:
+            return
+        entry[1].cancel()
+        warmup = cls._warmups.pop(user_id, None)
+        if warmup is not None:
+            warmup.cancel()
+            Manager.release_reader(user_id)
+        cls.cancelled += 1
+        logger.debug("Prefetch for user %s is cancelled", user_id)
+
+    @classmethod
+    async def download(cls, user_id: str, file_id: str) -> Path:
+        """
+        Get path to the downloaded file, prefetched download is reused.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            file_id (str): file id on Google Drive.
+
+        Returns:
+            Path: path to downloaded file.
+
+        Raises:
+            GoogleDriveError: if problem with google drive connection.
+        """
+        entry = cls._downloads.get(user_id)
+        if entry and entry[0] == file_id:
+            del cls._downloads[user_id]
+            cls.used += 1
+            return await entry[1]
+        cls.cancel(user_id)
+        return await _download(file_id)
+
+    @classmethod
+    def warm_up(cls, user_id: str, file_name: str, file_path: Path, file_id: str) -> None:
+        """
+        Opens reader of the user and prepares the first sheet preview in background.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            file_name (str): file name.
+            file_path (Path): path to downloaded file.
+            file_id (str): file id on Google Drive.
+        """
+        # Repeated warm up of the same sheet waits for the running load.
+        reader = Manager.get_reader(user_id, file_name, file_path, file_id)
+        task = asyncio.create_task(reader.get_sheet_preview())
+        task.add_done_callback(cls._log_failure)
+        cls._warmups[user_id] = task
+
+    @classmethod
+    def finish(cls, user_id: str) -> None:
+        """
+        Forgets warm up of the user, its reader is used by the file questions node.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+        """
+        cls._warmups.pop(user_id, None)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        """Logs failed background work, the error is raised again by the real request."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Prefetch failed: %s", task.exception())
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get prefetch counters.
+
+        Returns:
+            dict: counters with keys: started, used, cancelled.
+        """
+        return {"started": cls.started, "used": cls.used, "cancelled": cls.cancelled}
@@ -1,9 +1,122 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from logging import getLogger
+
 from langchain_core.tools import StructuredTool
 
+from agent.constants import (LOG_LEVEL, TOOL_CACHE_SIZE, TOOL_CONCURRENCY,
+                             TOOL_TIMEOUT, TOOL_TIMEOUTS)
 from agent.excel.readers_manager import Manager
 from agent.parser.parser import WebParser
 
 parser = WebParser()
+logger = getLogger("tools")
+logger.setLevel(LOG_LEVEL)
+# Tools which results depend only on their arguments and the file revision.
+CACHED_TOOLS = {
+    "get_sheet_preview",
+    "search_data",
+    "get_cell_value",
+    "get_range_values",
+    "analyze_column",
+}
+
+
+class ToolResultCache:
+    """
+    LRU cache of tool results keyed by tool name, arguments and file revision.
+
+    Arguments are validated by the tool schema, so defaults and types don't
+    make different keys. Results of a file revision are dropped once a newer
+    revision of the file is cached. Error results are not cached.
+    """
+
+    hits = 0
+    misses = 0
+    _results = OrderedDict()
+    _revisions = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def key(tool: StructuredTool, args: dict, file_key: tuple) -> tuple | None:
+        """
+        Makes the cache key of the tool call.
+
+        Args:
+            tool (StructuredTool): called tool.
+            args (dict): arguments of the call.
+            file_key (tuple): (file id, revision) of the file read by the tool.
+
+        Returns:
+            tuple | None: cache key, None if the result must not be cached.
+        """
+        if tool.name not in CACHED_TOOLS or file_key is None or not TOOL_CACHE_SIZE:
+            return None
+        try:
+            args = tool.args_schema.model_validate(args).model_dump()
+        except Exception:
+            return None
+        return (tool.name, json.dumps(args, sort_keys=True, default=str), *file_key)
+
+    @classmethod
+    def get(cls, key: tuple):
+        """
+        Get cached result.
+
+        Args:
+            key (tuple): key made by `ToolResultCache.key`.
+
+        Returns:
+            result of the tool, None if it is not cached.
+        """
+        with cls._lock:
+            result = cls._results.get(key)
+            if result is None:
+                cls.misses += 1
+                return None
+            cls.hits += 1
+            cls._results.move_to_end(key)
+            return result
+
+    @classmethod
+    def put(cls, key: tuple, result) -> None:
+        """
+        Caches the result, results of old revisions of the file are dropped.
+
+        Args:
+            key (tuple): key made by `ToolResultCache.key`.
+            result: result of the tool.
+        """
+        if isinstance(result, dict) and "error" in result:
+            return
+        *_, file_id, revision = key
+        with cls._lock:
+            if cls._revisions.get(file_id, revision) != revision:
+                for old in [old for old in cls._results if old[-2] == file_id and old[-1] != revision]:
+                    del cls._results[old]
+            cls._revisions[file_id] = revision
+            cls._results[key] = result
+            while len(cls._results) > TOOL_CACHE_SIZE:
+                cls._results.popitem(last=False)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get cache counters.
+
+        Returns:
+            dict: counters with keys: entries, hits, misses, hit_rate.
+        """
+        with cls._lock:
+            total = cls.hits + cls.misses
+            return {
+                "entries": len(cls._results),
+                "hits": cls.hits,
+                "misses": cls.misses,
+                "hit_rate": cls.hits / total if total else 0.0,
+            }
 
 
 def get_tools(user_id: str) -> list[StructuredTool]:
@@ -22,7 +135,70 @@ def get_tools(user_id: str) -> list[StructuredTool]:
     ]:
         tools.append(
             StructuredTool.from_function(
-                func, name=func.__name__, description=func.__doc__
+                coroutine=func, name=func.__name__, description=func.__doc__
             )
         )
     return tools
+
+
+async def reselect_file() -> dict:
+    """
+    Closes the current file, so the user selects another file with the next message.
+
+    Call it ONLY when the user explicitly asks to work with a different file
+    or is dissatisfied with the current file choice.
+
+    Returns:
+        dict: confirmation, after it answer the user and ask which file to open.
+    """
+    return {"reselect": True}
+
+
+RESELECT_TOOL = StructuredTool.from_function(
+    coroutine=reselect_file, name=reselect_file.__name__, description=reselect_file.__doc__
+)
+
+
+async def run_tool_calls(
+    tools: list[StructuredTool], tool_calls: list[dict], file_key: tuple = None
+) -> list:
+    """
+    Runs tool calls of one model step concurrently.
+
+    At most TOOL_CONCURRENCY calls run at once. A call which exceeds its
+    timeout or fails gets an error result, other calls are not affected.
+    Results of Excel tools are taken from ToolResultCache if possible.
+
+    Args:
+        tools (list[StructuredTool]): tools bound to llm.
+        tool_calls (list[dict]): tool calls of llm response.
+        file_key (tuple, optional): (file id, revision) of the file read by the tools.
+
+    Returns:
+        list: results in order of the tool calls.
+    """
+    tools = {tool.name: tool for tool in tools}
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+
+    async def run(tool_call: dict):
+        tool = tools.get(tool_call["name"])
+        if tool is None:
+            return {"error": f"Unknown tool {tool_call['name']}"}
+        key = ToolResultCache.key(tool, tool_call["args"], file_key)
+        if key is not None and (result := ToolResultCache.get(key)) is not None:
+            return result
+        timeout = TOOL_TIMEOUTS.get(tool.name, TOOL_TIMEOUT)
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(tool.ainvoke(tool_call["args"]), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Tool %s exceeded timeout of %s s", tool.name, timeout)
+                return {"error": f"Tool {tool.name} didn't finish in {timeout:g} seconds"}
+            except Exception as exc:
+                logger.exception("Tool %s failed", tool.name)
+                return {"error": f"Tool {tool.name} failed: {exc}"}
+        if key is not None:
+            ToolResultCache.put(key, result)
+        return result
+
+    return await asyncio.gather(*map(run, tool_calls))
@@ -1,7 +1,10 @@
+import time
+
 from langchain_core.messages import BaseMessage
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph
 
+from agent.constants import DRIVE_REVALIDATE_SECONDS
 from agent.graph.models import State
 from agent.graph.nodes import (error_handling_node, file_downloading_node,
                                file_questions_node, file_selection_node,
@@ -23,6 +26,10 @@ def start_router(state):
         return "file_selection"
     if state.get("selected_file_path", None) is None:
         return "file_downloading"
+    # Downloading node checks the file revision, unchanged file is not downloaded again.
+    checked = state.get("selected_file_checked", None)
+    if checked is None or time.time() - checked > DRIVE_REVALIDATE_SECONDS:
+        return "file_downloading"
     return "file_questions"
 
 
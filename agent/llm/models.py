@@ -1,18 +1,45 @@
-from langchain_core.messages import BaseMessage, trim_messages
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from logging import getLogger
+
+import httpx
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
 from openai import APIConnectionError, APITimeoutError, BadRequestError, NotFoundError
 
+from agent.constants import LLM_MAX_CONNECTIONS, LOG_LEVEL
 from agent.exceptions import LLMError
+from agent.llm.tokens import count_tokens
+
+# Count of cached llm runnables, old settings and tool sets are dropped.
+MAX_RUNNABLES = 32
+logger = getLogger("llm")
+logger.setLevel(LOG_LEVEL)
 
 
 class LLMAgent:
     """
     Class for communicating with LLM.
+
+    All instances share one keep-alive HTTP client of the running event loop.
+    Runnables with bound tools and structured output are built once per
+    settings, tools and schema, and reused by next instances. Settings are
+    class attributes, changed settings make new runnables.
     """
 
     model: str = None
     api_key: str = None
     base_url: str = None
+    hits = 0
+    misses = 0
+    _runnables = OrderedDict()
+    _http_client = None
+    _loop = None
+    _lock = threading.Lock()
 
     def __init__(
         self, tools: list = None, schema: dict = None, max_tokens: int = 1000, **kwargs
@@ -30,26 +57,80 @@ class LLMAgent:
         """
         if self.model is None or self.api_key is None:
             raise RuntimeError("The model and the api_key must be specified.")
-        if tools:
-            self.llm = ChatOpenAI(
-                model=self.model,
-                api_key=self.api_key,
-                base_url=self.base_url,
-                timeout=30,
-                max_completion_tokens=max_tokens,
-            ).bind_tools(tools, **kwargs)
-        else:
-            self.llm = ChatOpenAI(
-                model=self.model,
-                api_key=self.api_key,
-                base_url=self.base_url,
+        key = (
+            self.model,
+            self.api_key,
+            self.base_url,
+            max_tokens,
+            json.dumps(
+                [convert_to_openai_tool(tool) for tool in tools or []], sort_keys=True, default=str
+            ),
+            json.dumps(kwargs, sort_keys=True, default=str),
+            json.dumps(schema, sort_keys=True),
+        )
+        self.llm = self._get_runnable(key, tools, schema, max_tokens, kwargs)
+
+    @classmethod
+    def _get_runnable(
+        cls, key: tuple, tools: list, schema: dict, max_tokens: int, kwargs: dict
+    ) -> Runnable:
+        """Get cached llm runnable, it is built on the first request."""
+        with cls._lock:
+            http_client = cls._get_http_client()
+            runnable = cls._runnables.get(key)
+            if runnable is not None:
+                cls._runnables.move_to_end(key)
+                cls.hits += 1
+                return runnable
+            cls.misses += 1
+            runnable = ChatOpenAI(
+                model=cls.model,
+                api_key=cls.api_key,
+                base_url=cls.base_url,
                 timeout=30,
                 max_completion_tokens=max_tokens,
+                http_async_client=http_client,
             )
-        if schema:
-            self.llm = self.llm.with_structured_output(
-                schema, method="json_mode", include_raw=True
+            if tools:
+                runnable = runnable.bind_tools(tools, **kwargs)
+            if schema:
+                runnable = runnable.with_structured_output(
+                    schema, method="json_mode", include_raw=True
+                )
+            cls._runnables[key] = runnable
+            while len(cls._runnables) > MAX_RUNNABLES:
+                cls._runnables.popitem(last=False)
+            return runnable
+
+    @classmethod
+    def _get_http_client(cls) -> httpx.AsyncClient:
+        """Get shared HTTP client of the running event loop, the lock must be held."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if cls._http_client is None or (loop is not None and cls._loop is not loop):
+            # Connections are bound to the loop which opened them, so runnables are built again.
+            cls._http_client = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
             )
+            cls._loop = loop
+            cls._runnables.clear()
+        return cls._http_client
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get counters of llm runnables cache.
+
+        Returns:
+            dict: counters with keys: runnables, hits, misses.
+        """
+        return {"runnables": len(cls._runnables), "hits": cls.hits, "misses": cls.misses}
 
     async def call_model(self, messages: list[BaseMessage]) -> BaseMessage:
         """
@@ -63,9 +144,7 @@ class LLMAgent:
 
         Raises: LLMError when problems with response completion.
         """
-        # counter = ChatOpenAI(model=self.model, api_key=self.api_key)
-        # messages = trim_messages(messages, max_tokens=1000, token_counter=counter)
-
+        logger.info("Prompt tokens: %d, messages: %d", count_tokens(messages), len(messages))
         try:
             return await self.llm.ainvoke(messages)
         except NotFoundError as exc:
@@ -0,0 +1,79 @@
+import json
+from functools import lru_cache
+from logging import getLogger
+
+from langchain_core.messages import BaseMessage
+
+from agent.constants import LOG_LEVEL, TOKENIZER_ENCODING
+
+# Tokens of message role and separators added by the chat format.
+MESSAGE_OVERHEAD = 4
+# Average length of a token in characters, it is used without the tokenizer.
+CHARS_PER_TOKEN = 3
+
+logger = getLogger("tokens")
+logger.setLevel(LOG_LEVEL)
+
+
+@lru_cache(maxsize=1)
+def load_encoding():
+    """
+    Get tiktoken encoding, it is loaded once.
+
+    tiktoken downloads the encoding on first use, so the agent loads it in
+    background on start instead of the first request.
+
+    Returns:
+        Encoding: tiktoken encoding, None if it can't be loaded.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as exc:
+        logger.warning("Tokenizer %s is not available, tokens are estimated: %s", TOKENIZER_ENCODING, exc)
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _text_tokens(text: str) -> int:
+    """Count of tokens in the text."""
+    encoding = load_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """
+    Count tokens of the chat message.
+
+    Counts are cached by message text, so history messages are encoded once.
+
+    Args:
+        message (BaseMessage): chat message.
+
+    Returns:
+        int: count of tokens including the chat format overhead.
+    """
+    content = message.content
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False)
+    tokens = MESSAGE_OVERHEAD + _text_tokens(content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        tokens += _text_tokens(json.dumps(tool_calls, ensure_ascii=False, default=str))
+    return tokens
+
+
+def count_tokens(messages: list[BaseMessage]) -> int:
+    """
+    Count tokens of the chat messages.
+
+    Args:
+        messages (list[BaseMessage]): chat messages.
+
+    Returns:
+        int: count of tokens.
+    """
+    return sum(map(message_tokens, messages))
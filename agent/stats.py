@@ -0,0 +1,46 @@
+import asyncio
+from logging import DEBUG, getLogger
+
+from agent.constants import LOG_LEVEL, STATS_LOG_SECONDS
+from agent.excel.readers_manager import Manager
+from agent.GD.requestor import GDRequestor
+from agent.graph.tools import ToolResultCache
+
+logger = getLogger("stats")
+logger.setLevel(LOG_LEVEL)
+
+
+class StatsLog:
+    """
+    Background log of cache counters at DEBUG level.
+
+    Counters of the files cache, the readers memory pool and the tool
+    results cache are logged every STATS_LOG_SECONDS.
+    """
+
+    _task = None
+
+    @classmethod
+    def start(cls) -> None:
+        """Starts the log in the running event loop, if it is not started yet."""
+        if STATS_LOG_SECONDS and (cls._task is None or cls._task.done()):
+            cls._task = asyncio.create_task(cls._loop())
+
+    @classmethod
+    def log(cls) -> None:
+        """Logs current counters."""
+        if not logger.isEnabledFor(DEBUG):
+            return
+        logger.debug("Files cache: %s", GDRequestor().cache_stats())
+        logger.debug("Readers pool: %s", Manager.stats())
+        logger.debug("Tool results cache: %s", ToolResultCache.stats())
+
+    @classmethod
+    async def _loop(cls) -> None:
+        """Logs counters every STATS_LOG_SECONDS."""
+        while True:
+            await asyncio.sleep(STATS_LOG_SECONDS)
+            try:
+                cls.log()
+            except Exception as exc:
+                logger.warning("Stats are not logged: %s", exc)
@@ -0,0 +1,174 @@
+"""
+End-to-end latency benchmark of the agent with local fake Drive and LLM.
+
+Conversations run through `agent.graph.workflows.interact` ("graph" mode)
+and through `/v1/chat/completions` of the API app ("api" mode, in-process
+ASGI transport). The API keeps one state for all clients, so in "api" mode
+only the first conversation selects a file. The report shows p50/p95/p99 of
+every graph node and of whole turns, and request counts of the fakes.
+
+Run: python -m benchmarks.e2e [conversations] [llm_latency_ms] [rows] [drive_latency_ms]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import dotenv
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from benchmarks.fake_drive import FakeDrive, make_files
+from benchmarks.fake_llm import DEFAULT_TOOL_CALLS, MODEL, FakeLLM
+from benchmarks.startup import make_service_account
+
+FILES = 4
+QUESTIONS = ["Что находится в ячейке B2?", "Найди строки с Москвой"]
+
+
+class NodeTimer(AsyncCallbackHandler):
+    """Collects durations of graph nodes by callbacks of the graph runs."""
+
+    def __init__(self):
+        self.durations = {}
+        self._started = {}
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Hidden runs are graph internals: start routing and state writes.
+        if node and kwargs.get("name") == node and "langsmith:hidden" not in (tags or []):
+            self._started[run_id] = (node, time.perf_counter())
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            self.durations.setdefault(node, []).append(time.perf_counter() - start)
+
+    async def on_chain_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+
+def configure_env(tmp: Path, drive: FakeDrive, llm: FakeLLM) -> None:
+    """Points the agent settings to the fakes, it must be done before the agent is imported."""
+    # Settings of the benchmark must not be overridden by the local .env file.
+    dotenv.load_dotenv = lambda *args, **kwargs: False
+    credentials = make_service_account(tmp / "credentials.json", f"{drive.url}/token")
+    os.environ.update(
+        {
+            "GD_CREDENTIALS_FILE": str(credentials),
+            "AUTH_DATA_DIR": str(tmp),
+            "CACHE_DIR": str(tmp / "cache"),
+            "DRIVE_API_ENDPOINT": drive.url,
+            "SHEETS_API_ENDPOINT": drive.url,
+            "LLM_BASE_URL": llm.url,
+            "LLM_API_NAME": MODEL,
+            "LLM_API_KEY": "fake",
+            "LOG_LEVEL": "WARNING",
+        }
+    )
+    (tmp / "cache").mkdir()
+
+
+def report(name: str, durations: dict) -> None:
+    """Prints percentiles of durations."""
+    width = max(map(len, [name, *durations]))
+    print(f"\n{name:<{width}} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for key, values in durations.items():
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+        print(f"{key:>{width}} {len(values):>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}")
+
+
+async def run(conversations: int, files: list[dict]) -> None:
+    """Runs conversations in both modes and prints the report."""
+    # Imported after the environment is configured, settings are read on import.
+    import httpx
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    from agent.agent import Agent
+    from agent.graph import workflows
+    from agent.graph.tools import ToolResultCache
+    from api.main import app as api_app
+
+    agent = Agent()
+    agent.api_key = "fake"
+    agent.base_url = os.environ["LLM_BASE_URL"]
+    agent.model = MODEL
+    await agent.check_health()
+
+    timer = NodeTimer()
+    workflows.app = workflows.app.with_config(callbacks=[timer])
+
+    async def graph_turns(index: int, turns: list[str]) -> list[float]:
+        messages = []
+        durations = []
+        for text in turns:
+            messages.append(HumanMessage(content=text))
+            start = time.perf_counter()
+            answer = await workflows.interact(f"benchmark-{index}", messages)
+            durations.append(time.perf_counter() - start)
+            messages.append(AIMessage(content=answer))
+        return durations
+
+    async def api_turns(client: httpx.AsyncClient, turns: list[str]) -> list[float]:
+        messages = []
+        durations = []
+        for text in turns:
+            messages.append({"role": "user", "content": text})
+            start = time.perf_counter()
+            response = await client.post(
+                "/v1/chat/completions", json={"model": MODEL, "messages": messages, "stream": False}
+            )
+            response.raise_for_status()
+            durations.append(time.perf_counter() - start)
+            messages.append(
+                {"role": "assistant", "content": response.json()["choices"][0]["message"]["content"]}
+            )
+        return durations
+
+    transport = httpx.ASGITransport(app=api_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://agent", timeout=120) as client:
+        for mode in ("graph", "api"):
+            timer.durations = {}
+            turns = {"first turn": [], "next turns": []}
+            for index in range(conversations):
+                file = files[index % len(files)]
+                script = [f"Открой файл {file['name']}", *QUESTIONS]
+                if mode == "graph":
+                    durations = await graph_turns(index, script)
+                else:
+                    durations = await api_turns(client, script)
+                turns["first turn"].append(durations[0])
+                turns["next turns"].extend(durations[1:])
+            report(f"{mode} nodes", timer.durations)
+            report(f"{mode} e2e", turns)
+    print(f"\ntool results cache: {ToolResultCache.stats()}")
+
+
+def main(conversations: int, llm_latency: float, rows: int, drive_latency: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        drive = FakeDrive(make_files(tmp / "drive", FILES, rows), latency=drive_latency).start()
+        # Independent tool calls of one step: Excel reads and web pages served by the fake drive.
+        tool_calls = [
+            *DEFAULT_TOOL_CALLS,
+            *({"name": "get_site_info", "args": {"url": f"{drive.url}/site?page={page}"}} for page in (1, 2)),
+        ]
+        llm = FakeLLM(latency=llm_latency, tool_calls=tool_calls).start()
+        configure_env(tmp, drive, llm)
+        files = [{"id": file.id, "name": file.name} for file in drive.files.values()]
+        asyncio.run(run(conversations, files))
+        print(f"\ndrive requests: {drive.requests}")
+        print(f"llm requests: {llm.requests}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 1000,
+        float(sys.argv[4]) / 1000 if len(sys.argv) > 4 else 0.0,
+    )
@@ -0,0 +1,118 @@
+"""
+Benchmark of excel file parses made by ExcelReader during one user question.
+
+The question is modelled as the file questions node does it: file summary and
+sheet preview for the system prompt (twice), previews of all sheets and three
+tool calls on a file of three sheets.
+
+In "process" mode sheets are parsed by worker processes, one worker pass is
+one parse of the file, passes are counted with parses of this process.
+
+Run: python -m benchmarks.excel_parses [rows] [thread|process]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+from agent.excel import excel_reader, executor
+from agent.excel.excel_reader import ExcelReader
+from agent.excel.workbook import Workbook
+from benchmarks.synthetic import make_workbook
+
+
+class ParseCounter:
+    """
+    Counts calls of openpyxl.load_workbook, including calls made by pandas.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._original = openpyxl.load_workbook
+
+    def __enter__(self):
+        def counting_load_workbook(*args, **kwargs):
+            self.count += 1
+            return self._original(*args, **kwargs)
+
+        openpyxl.load_workbook = counting_load_workbook
+        return self
+
+    def __exit__(self, *exc):
+        openpyxl.load_workbook = self._original
+
+
+async def legacy_question(file_path: Path) -> None:
+    """Access pattern of ExcelReader before the shared workbook handle."""
+    sheet_names = pd.ExcelFile(file_path).sheet_names
+    sheet_name = sheet_names[0]
+    df = pd.read_excel(file_path, sheet_name)
+    df.head(5)
+    for other in sheet_names[1:]:
+        pd.read_excel(file_path, other).head(5)
+    df[df["client"].astype(str).str.contains("Клиент 1", case=False, na=False)]
+    openpyxl.load_workbook(file_path, data_only=True)[sheet_name]["B2"].value
+    tuple(openpyxl.load_workbook(file_path, data_only=True)[sheet_name]["A1:C3"])
+
+
+async def shared_question(file_path: Path) -> None:
+    """Access pattern of ExcelReader with the shared workbook handle."""
+    reader = ExcelReader(file_path.name, file_path)
+    for _ in range(2):
+        await reader.get_file_summary()
+        await reader.get_sheet_preview()
+    for sheet_name in reader.sheets:
+        await reader.get_sheet_preview(sheet_name)
+    await reader.search_data(reader.sheets[0], "Клиент 1")
+    await reader.get_cell_value(reader.sheets[0], "B2")
+    await reader.get_range_values(reader.sheets[0], "A1:C3")
+
+
+class WorkerCounter:
+    """
+    Counts worker process passes of ExcelReader.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._original = excel_reader.run_in_process
+
+    def __enter__(self):
+        async def counting_run_in_process(*args, **kwargs):
+            # In thread mode the fallback runs on the shared workbook, it is counted by parses.
+            self.count += executor.process_mode()
+            return await self._original(*args, **kwargs)
+
+        excel_reader.run_in_process = counting_run_in_process
+        return self
+
+    def __exit__(self, *exc):
+        excel_reader.run_in_process = self._original
+
+
+async def main(rows: int, mode: str) -> None:
+    executor.configure(mode)
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = make_workbook(Path(tmp) / "bench.xlsx", rows, sheets=3)
+        for name, question in [("before", legacy_question), ("after", shared_question)]:
+            start_parses = Workbook.parse_count
+            started = time.perf_counter()
+            with ParseCounter() as counter, WorkerCounter() as workers:
+                await question(file_path)
+            elapsed = time.perf_counter() - started
+            parses = counter.count + workers.count + Workbook.parse_count - start_parses
+            print(f"{name:>6}: {parses} parses per question, {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+            sys.argv[2] if len(sys.argv) > 2 else "thread",
+        )
+    )
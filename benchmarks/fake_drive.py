@@ -0,0 +1,316 @@
+"""
+Local stand-in for Google Drive and Sheets APIs used by GDRequestor.
+
+Implemented endpoints:
+- POST /token - OAuth token endpoint for service account credentials;
+- GET /drive/v3/files - listing, one page per PAGE_SIZE files;
+- GET /drive/v3/files/{id} - metadata, `alt=media` - content with Range support;
+- GET /drive/v3/files/{id}/export - native Google Sheets as xlsx;
+- GET /drive/v3/changes/startPageToken, /drive/v3/changes - empty changes feed;
+- GET /v4/spreadsheets/{id}, /v4/spreadsheets/{id}/values:batchGet - Sheets API;
+- GET /site - web page for the web parser tool.
+
+Files are local xlsx files, native Google Sheets are backed by xlsx files too.
+
+Run: python -m benchmarks.fake_drive [port] [rows] [files]
+"""
+
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
+
+from benchmarks.synthetic import make_workbook
+
+PAGE_SIZE = 100
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+SITE_PAGE = "<html><body><h1>Клиент 42</h1><p>Москва, договор 42.</p></body></html>".encode()
+
+
+class FakeFile:
+    """File of the fake drive."""
+
+    def __init__(self, file_id: str, name: str, path: Path, native: bool = False):
+        """
+        Initialize FakeFile.
+
+        Args:
+            file_id (str): file id.
+            name (str): file name.
+            path (Path): path to xlsx file with the content.
+            native (bool, optional): if True, the file is served as native Google Sheets.
+        """
+        self.id = file_id
+        self.name = name
+        self.path = Path(path)
+        self.native = native
+        self.content = self.path.read_bytes()
+        self.md5 = hashlib.md5(self.content).hexdigest()
+        self._grid = None
+        self._lock = threading.Lock()
+
+    @property
+    def metadata(self) -> dict:
+        """Drive metadata of the file."""
+        if self.native:
+            return {"id": self.id, "name": self.name, "mimeType": SPREADSHEET_MIME_TYPE,
+                    "modifiedTime": self.md5}
+        return {"id": self.id, "name": self.name, "mimeType": XLSX_MIME_TYPE,
+                "size": str(len(self.content)), "md5Checksum": self.md5, "headRevisionId": self.md5}
+
+    @property
+    def grid(self) -> dict:
+        """Cell values of every sheet, loaded on first access."""
+        with self._lock:
+            if self._grid is None:
+                book = load_workbook(self.path, read_only=True)
+                self._grid = {
+                    ws.title: [list(row) for row in ws.iter_rows(values_only=True)]
+                    for ws in book.worksheets
+                }
+                book.close()
+        return self._grid
+
+    def values(self, a1_range: str) -> list[list]:
+        """Values of the range in Sheets API format, trailing empty cells are trimmed."""
+        sheet_name, _, cells = a1_range.partition("!")
+        rows = self.grid[sheet_name.strip("'").replace("''", "'")]
+        if cells:
+            if ":" not in cells:
+                cells = f"{cells}:{cells}"
+            min_col, min_row, max_col, max_row = range_boundaries(cells)
+        else:
+            min_col = min_row = max_col = max_row = None
+        result = []
+        for row in rows[(min_row or 1) - 1 : max_row]:
+            row = [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in row[(min_col or 1) - 1 : max_col]
+            ]
+            while row and row[-1] is None:
+                row.pop()
+            result.append(["" if value is None else value for value in row])
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+
+class FakeDrive(ThreadingHTTPServer):
+    """
+    HTTP server of the fake drive.
+
+    Attributes:
+        latency (float): delay in seconds before every response.
+        requests (dict): count of requests by endpoint.
+        ranges (bool): if False, Range headers are ignored and whole files are sent.
+        drops (int): count of next media responses cut in the middle of the body.
+        media_ranges (list): Range headers of media requests, None for requests without it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files: list[FakeFile], port: int = 0, latency: float = 0.0):
+        """
+        Initialize FakeDrive.
+
+        Args:
+            files (list[FakeFile]): files of the drive.
+            port (int, optional): port to listen, 0 means any free port.
+            latency (float, optional): delay in seconds before every response.
+        """
+        super().__init__(("127.0.0.1", port), FakeDriveHandler)
+        self.files = {file.id: file for file in files}
+        self.latency = latency
+        self.requests = {}
+        self.ranges = True
+        self.drops = 0
+        self.media_ranges = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Base address of the server."""
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, endpoint: str) -> None:
+        """Counts the request to the endpoint."""
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def take_drop(self) -> bool:
+        """Checks if the next media response must be cut, the drop is counted."""
+        with self._lock:
+            if self.drops <= 0:
+                return False
+            self.drops -= 1
+            return True
+
+    def start(self) -> "FakeDrive":
+        """Serves requests in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """Request handler of the fake drive."""
+
+    protocol_version = "HTTP/1.1"
+    server: FakeDrive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None) -> None:
+        """Sends the response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data: dict, status: int = 200) -> None:
+        """Sends JSON response."""
+        self._send(status, json.dumps(data, ensure_ascii=False).encode(), "application/json")
+
+    def _file(self, file_id: str) -> FakeFile | None:
+        """Get the file by id, 404 is sent if it is not found."""
+        file = self.server.files.get(file_id)
+        if file is None:
+            self._json({"error": {"code": 404, "message": f"File not found: {file_id}"}}, 404)
+        return file
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        self.server.count("token")
+        self._json({"access_token": "fake", "expires_in": 3600, "token_type": "Bearer"})
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+
+        match parts:
+            case ["drive", "v3", "files"]:
+                self.server.count("files.list")
+                files = list(self.server.files.values())
+                start = int(query.get("pageToken", ["0"])[0])
+                page_size = min(int(query.get("pageSize", [PAGE_SIZE])[0]), PAGE_SIZE)
+                page = files[start : start + page_size]
+                result = {"files": [{"id": file.id, "name": file.name} for file in page]}
+                if start + page_size < len(files):
+                    result["nextPageToken"] = str(start + page_size)
+                self._json(result)
+            case ["drive", "v3", "files", file_id, "export"]:
+                self.server.count("files.export")
+                if file := self._file(file_id):
+                    self._send(200, file.content, XLSX_MIME_TYPE)
+            case ["drive", "v3", "files", file_id] if query.get("alt") == ["media"]:
+                self.server.count("files.get_media")
+                if file := self._file(file_id):
+                    self._media(file)
+            case ["drive", "v3", "files", file_id]:
+                self.server.count("files.get")
+                if file := self._file(file_id):
+                    self._json(file.metadata)
+            case ["drive", "v3", "changes", "startPageToken"]:
+                self.server.count("changes.startPageToken")
+                self._json({"startPageToken": "1"})
+            case ["drive", "v3", "changes"]:
+                self.server.count("changes.list")
+                self._json({"newStartPageToken": "1", "changes": []})
+            case ["v4", "spreadsheets", file_id, "values:batchGet"]:
+                self.server.count("values.batchGet")
+                if file := self._file(file_id):
+                    self._json({
+                        "valueRanges": [
+                            {"range": a1_range, "values": file.values(a1_range)}
+                            for a1_range in query.get("ranges", [])
+                        ]
+                    })
+            case ["v4", "spreadsheets", file_id]:
+                self.server.count("spreadsheets.get")
+                if file := self._file(file_id):
+                    self._json({
+                        "sheets": [
+                            {"properties": {"title": title, "gridProperties": {
+                                "rowCount": max(len(rows), 1000),
+                                "columnCount": max(max(map(len, rows), default=0), 26),
+                            }}}
+                            for title, rows in file.grid.items()
+                        ]
+                    })
+            case ["site"]:
+                self.server.count("site")
+                self._send(200, SITE_PAGE, "text/html; charset=utf-8")
+            case _:
+                self._json({"error": {"code": 404, "message": "Unknown endpoint"}}, 404)
+
+    def _media(self, file: FakeFile) -> None:
+        """Sends the file content or its byte range."""
+        content = file.content
+        range_header = self.headers.get("Range")
+        self.server.media_ranges.append(range_header)
+        if not range_header or not self.server.ranges:
+            status, body, headers = 200, content, {}
+        else:
+            start, _, end = range_header.removeprefix("bytes=").partition("-")
+            start = int(start)
+            end = min(int(end) if end else len(content) - 1, len(content) - 1)
+            status, body = 206, content[start : end + 1]
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(content)}"}
+        if self.server.take_drop():
+            # Full length is declared, the connection is closed after a half of the body.
+            self.send_response(status)
+            self.send_header("Content-Type", XLSX_MIME_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self._send(status, body, XLSX_MIME_TYPE, headers)
+
+
+def make_files(directory: Path, count: int, rows: int) -> list[FakeFile]:
+    """
+    Generates files of the fake drive, every second file is native Google Sheets.
+
+    Args:
+        directory (Path): directory for generated xlsx files.
+        count (int): count of files.
+        rows (int): count of data rows on each sheet.
+
+    Returns:
+        list[FakeFile]: generated files.
+    """
+    files = []
+    for index in range(count):
+        path = make_workbook(directory / f"report_{index}.xlsx", rows, sheets=2, seed=index)
+        native = index % 2 == 1
+        name = f"report {index}" if native else f"report {index}.xlsx"
+        files.append(FakeFile(f"file{index}", name, path, native))
+    return files
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        server = FakeDrive(make_files(Path(tmp), count, rows), port)
+        print(f"Fake drive is listening on {server.url}")
+        server.serve_forever()
@@ -0,0 +1,178 @@
+"""
+Local OpenAI-compatible stub of LLM for the agent benchmarks.
+
+Answers are made by rules, so whole conversations go through the graph:
+- JSON mode call with the file selection prompt selects the file named in the
+  last user message, or the first available file;
+- call with tools returns the scripted tool calls, after tool results it
+  returns a plain answer;
+- call with the history summary prompt returns a fixed summary;
+- other JSON mode calls answer the question without reselection.
+
+Every response is delayed by the configured latency.
+
+Run: python -m benchmarks.fake_llm [port] [latency_ms]
+"""
+
+import ast
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL = "fake-model"
+FILES_LIST = re.compile(r"AVAILABLE FILES\n[^\n]*\n(\[[^\n]*\])\n")
+DEFAULT_TOOL_CALLS = [
+    {"name": "get_cell_value", "args": {"sheet_name": "Sheet1", "cell_reference": "B2"}},
+    {"name": "get_range_values", "args": {"sheet_name": "Sheet2", "range_reference": "A1:G20"}},
+    {"name": "search_data", "args": {"sheet_name": "Sheet1", "search_term": "Москва"}},
+]
+
+
+def _text(message: dict) -> str:
+    """Text content of the chat message."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+class FakeLLM(ThreadingHTTPServer):
+    """
+    HTTP server of the stub LLM.
+
+    Attributes:
+        latency (float): delay in seconds before every response.
+        tool_calls (list[dict]): scripted tool calls in format `{"name": tool, "args": {...}}`.
+        requests (dict): count of requests by kind: selection, tools, answer.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, tool_calls: list[dict] = None):
+        """
+        Initialize FakeLLM.
+
+        Args:
+            port (int, optional): port to listen, 0 means any free port.
+            latency (float, optional): delay in seconds before every response.
+            tool_calls (list[dict], optional): scripted tool calls. Defaults to DEFAULT_TOOL_CALLS.
+        """
+        super().__init__(("127.0.0.1", port), FakeLLMHandler)
+        self.latency = latency
+        self.tool_calls = DEFAULT_TOOL_CALLS if tool_calls is None else tool_calls
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Base address of the OpenAI-compatible API."""
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+    def count(self, kind: str) -> None:
+        """Counts the request of the kind."""
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def start(self) -> "FakeLLM":
+        """Serves requests in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def complete(self, request: dict) -> dict:
+        """Makes the assistant message for the chat completion request."""
+        messages = request["messages"]
+        system = _text(messages[0]) if messages and messages[0]["role"] == "system" else ""
+        user = next((_text(m) for m in reversed(messages) if m["role"] == "user"), "")
+
+        if request.get("tools"):
+            self.count("tools")
+            if messages[-1]["role"] == "tool" or not self.tool_calls:
+                return {"role": "assistant", "content": "Ответ по данным файла."}
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call["args"])},
+                    }
+                    for call in self.tool_calls
+                ],
+            }
+
+        if system.lstrip().startswith("You are summarizing"):
+            self.count("summary")
+            return {"role": "assistant", "content": "Пользователь спрашивал о данных файла."}
+
+        match = FILES_LIST.search(system)
+        if match:
+            self.count("selection")
+            files = ast.literal_eval(match.group(1))
+            named = [file for file in files if file["name"].lower() in user.lower()]
+            # The longest name wins, "report 1" is a part of "report 10".
+            file = max(named, key=lambda file: len(file["name"])) if named else next(iter(files), None)
+            answer = {
+                "file_id": file and file["id"],
+                "file_name": file and file["name"],
+                "answer": f"Открываю файл {file['name']}." if file else "Файлов нет.",
+            }
+        else:
+            self.count("answer")
+            answer = {"answer": "Ответ по данным файла.", "reselect": False}
+        return {"role": "assistant", "content": json.dumps(answer, ensure_ascii=False)}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Request handler of the stub LLM."""
+
+    protocol_version = "HTTP/1.1"
+    server: FakeLLM
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, data: dict) -> None:
+        """Sends JSON response."""
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._json({"object": "list", "data": [{"id": MODEL, "object": "model", "owned_by": "benchmark"}]})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(self.server.latency)
+        message = self.server.complete(request)
+        self._json(
+            {
+                "id": f"chatcmpl-{uuid.uuid4()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", MODEL),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        )
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8766
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    server = FakeLLM(port, latency)
+    print(f"Fake LLM is listening on {server.url}")
+    server.serve_forever()
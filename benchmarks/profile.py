@@ -0,0 +1,62 @@
+"""
+Benchmark of sheet profile build against per-call column analysis.
+
+Run: python -m benchmarks.profile [rows]
+"""
+
+import sys
+import time
+
+import pandas as pd
+
+from agent.excel.profile import build_profile
+from benchmarks.synthetic import make_dataframe
+
+
+def analyze_column(df: pd.DataFrame, column_name: str) -> dict:
+    """Column analysis as ExcelReader.analyze_column did it on every call."""
+    column = df[column_name]
+    stats = {"count": len(column), "null_count": column.isna().sum(), "unique_values": column.nunique()}
+    if pd.api.types.is_numeric_dtype(column):
+        stats.update(
+            {
+                "min": float(column.min()),
+                "max": float(column.max()),
+                "mean": float(column.mean()),
+                "median": float(column.median()),
+                "std": float(column.std()),
+            }
+        )
+    else:
+        stats["most_common_values"] = {
+            str(k): int(v) for k, v in column.value_counts().head(5).to_dict().items()
+        }
+    return stats
+
+
+def main(rows: int) -> None:
+    for name, extra_columns in [("narrow", 0), ("wide", 30)]:
+        df = make_dataframe(rows, extra_columns)
+
+        started = time.perf_counter()
+        for column in df.columns:
+            analyze_column(df, column)
+        per_call = time.perf_counter() - started
+
+        started = time.perf_counter()
+        profile = build_profile(df)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for column in profile["stats"]:
+            profile["stats"][column]
+        lookup = time.perf_counter() - started
+
+        print(
+            f"{name} {rows}x{len(df.columns)}: every column per call {per_call:.2f} s, "
+            f"profile build {build:.2f} s, all lookups {lookup * 1e6:.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,173 @@
+"""
+Microbenchmarks of ExcelReader tools on synthetic workbooks.
+
+Every tool is measured on narrow (7 columns) and wide (57 columns) sheets of
+mixed dtypes. Each measurement runs in a fresh interpreter on a fresh copy of
+the file without sidecar cache, so peak RSS belongs to one tool. The first
+(cold) call includes parsing, the second (warm) call shows the cost of the
+tool itself. Parses are counted in-process, the thread executor is used.
+
+Results are stored to JSON and may be compared with results of another commit.
+
+Run: python -m benchmarks.reader [--rows 1000,10000,100000] [--shapes narrow,wide]
+     [--tools get_sheet_preview,...] [--output results.json] [--compare baseline.json]
+
+Workbooks are generated once into --data-dir, 1M rows take minutes to generate.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SHAPES = {"narrow": 0, "wide": 50}
+TOOLS = {
+    "get_sheet_preview": lambda rows: ("Sheet1",),
+    "search_data": lambda rows: ("Sheet1", "Клиент 4242"),
+    "get_cell_value": lambda rows: ("Sheet1", f"B{rows // 2}"),
+    "get_range_values": lambda rows: ("Sheet1", f"A{rows // 2}:G{rows // 2 + 20}"),
+    "analyze_column": lambda rows: ("Sheet1", "amount"),
+}
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+async def _measure_tool(file_path: Path, tool: str, rows: int) -> dict:
+    """Calls the tool twice and measures the calls, it runs in the worker interpreter."""
+    from agent.excel import executor
+    from agent.excel.excel_reader import ExcelReader
+    from agent.excel.workbook import Workbook
+    from benchmarks.excel_parses import ParseCounter
+
+    executor.configure("thread")
+    base_rss = _peak_rss_mb()
+    reader = ExcelReader(file_path.name, file_path)
+    method = getattr(reader, tool)
+    args = TOOLS[tool](rows)
+    timings = []
+    with ParseCounter() as counter:
+        for _ in range(2):
+            started = time.perf_counter()
+            result = await method(*args)
+            timings.append(time.perf_counter() - started)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return {
+        "cold_s": timings[0],
+        "warm_s": timings[1],
+        "parses": counter.count + Workbook.parse_count,
+        "base_rss_mb": base_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def worker(file_path: str, tool: str, rows: int) -> None:
+    """Measures the tool on a fresh copy of the file and prints the result as JSON."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(shutil.copy(file_path, tmp))
+        print(json.dumps(asyncio.run(_measure_tool(copy, tool, rows))))
+
+
+def workbook(data_dir: Path, rows: int, shape: str) -> Path:
+    """Get the synthetic workbook, it is generated on first use."""
+    from benchmarks.synthetic import make_workbook
+
+    file_path = data_dir / f"{shape}_{rows}.xlsx"
+    if not file_path.exists():
+        print(f"generating {file_path.name}...", file=sys.stderr)
+        make_workbook(file_path.with_suffix(".tmp.xlsx"), rows, extra_columns=SHAPES[shape])
+        file_path.with_suffix(".tmp.xlsx").rename(file_path)
+    return file_path
+
+
+def _commit() -> str | None:
+    """Current git commit of the repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: Path) -> None:
+    """Prints ratios of the results to the baseline results."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["rows"], r["shape"], r["tool"]): r for r in baseline["results"]}
+    print(f"\ncompared with {baseline.get('commit')}: new / old")
+    for result in results:
+        previous = old.get((result["rows"], result["shape"], result["tool"]))
+        if previous is None:
+            continue
+        ratios = "  ".join(
+            f"{key} {result[key] / previous[key]:.2f}x" if previous[key] else f"{key} -"
+            for key in ("cold_s", "warm_s", "peak_rss_mb")
+        )
+        print(
+            f"{result['rows']:>9} {result['shape']:>6} {result['tool']:>17}: {ratios}  "
+            f"parses {previous['parses']} -> {result['parses']}"
+        )
+
+
+def main(args: argparse.Namespace) -> None:
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    print(f"{'rows':>9} {'shape':>6} {'tool':>17} {'cold s':>8} {'warm s':>8} {'rss MB':>8} {'parses':>6}")
+    for rows in args.rows:
+        for shape in args.shapes:
+            file_path = workbook(data_dir, rows, shape)
+            for tool in args.tools:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.reader", "--worker", str(file_path), tool, str(rows)],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout
+                result = {"rows": rows, "shape": shape, "tool": tool, **json.loads(output.splitlines()[-1])}
+                results.append(result)
+                print(
+                    f"{rows:>9} {shape:>6} {tool:>17} {result['cold_s']:>8.3f} {result['warm_s']:>8.3f} "
+                    f"{result['peak_rss_mb']:>8.0f} {result['parses']:>6}"
+                )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"commit": _commit(), "python": platform.python_version(), "results": results},
+                f,
+                indent=2,
+            )
+    if args.compare:
+        compare(results, Path(args.compare))
+
+
+def _list(value: str) -> list[str]:
+    return [item for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit()
+    parser = argparse.ArgumentParser(description="ExcelReader microbenchmarks")
+    parser.add_argument("--rows", type=lambda v: [int(i) for i in _list(v)], default=DEFAULT_ROWS)
+    parser.add_argument("--shapes", type=_list, default=list(SHAPES))
+    parser.add_argument("--tools", type=_list, default=list(TOOLS))
+    parser.add_argument("--data-dir", default=Path(tempfile.gettempdir()) / "gder-benchmarks")
+    parser.add_argument("--output", help="path to store results as JSON")
+    parser.add_argument("--compare", help="path to results of another commit")
+    main(parser.parse_args())
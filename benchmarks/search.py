@@ -0,0 +1,55 @@
+"""
+Benchmark of ExcelReader.search_data: full column scan against the search index.
+
+Run: python -m benchmarks.search [rows]
+"""
+
+import random
+import sys
+import time
+
+import pandas as pd
+
+from agent.excel.search_index import SheetIndex
+from benchmarks.synthetic import make_row
+
+QUERIES = [("Клиент 4242", "contains"), ("клиент 1", "prefix"), ("Казань", "exact"), ("orders/99", "contains")]
+
+
+def scan(df: pd.DataFrame, term: str) -> int:
+    """Search as ExcelReader.search_data did it before the index."""
+    matches = []
+    for col in df.columns:
+        if df[col].dtype == "object":
+            matches.extend(
+                df[df[col].astype(str).str.contains(term, case=False, na=False)].to_dict(
+                    orient="records"
+                )
+            )
+    return len(matches)
+
+
+def main(rows: int) -> None:
+    rnd = random.Random(0)
+    header = ["id", "client", "category", "city", "amount", "date", "url"]
+    df = pd.DataFrame([make_row(i, rnd) for i in range(rows)], columns=header)
+
+    started = time.perf_counter()
+    index = SheetIndex(df)
+    print(f"index build: {(time.perf_counter() - started) * 1000:.0f} ms for {rows} rows")
+
+    for term, match in QUERIES:
+        started = time.perf_counter()
+        scanned = scan(df, term)
+        scan_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        page, found, _, _ = index.search(term, match)
+        index_ms = (time.perf_counter() - started) * 1000
+        print(
+            f"{term!r:>14} ({match}): scan {scan_ms:8.1f} ms, {scanned} matches | "
+            f"index {index_ms:8.2f} ms, {found} rows"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
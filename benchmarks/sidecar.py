@@ -0,0 +1,33 @@
+"""
+Benchmark of time to the first sheet preview with and without sidecar cache.
+
+Run: python -m benchmarks.sidecar [rows]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from agent.excel.excel_reader import ExcelReader
+from benchmarks.synthetic import make_workbook
+
+
+async def first_preview(file_path: Path) -> float:
+    """Returns seconds from reader creation to the first sheet preview."""
+    started = time.perf_counter()
+    reader = ExcelReader(file_path.name, file_path)
+    await reader.get_sheet_preview()
+    return time.perf_counter() - started
+
+
+async def main(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = make_workbook(Path(tmp) / "bench.xlsx", rows)
+        print(f"parse + sidecar write: {await first_preview(file_path) * 1000:.1f} ms")
+        print(f"memory-mapped sidecar: {await first_preview(file_path) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,97 @@
+"""
+Benchmark of agent startup: imports and construction of GDRequestor.
+
+Every measurement runs in a fresh interpreter, so module caches of previous
+runs don't affect it. GDRequestor is built with a generated service account
+file, no network is used.
+
+Run: python -m benchmarks.startup [repeats]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+STEPS = {
+    "import requestor": "import agent.GD.requestor",
+    "build requestor": (
+        "from agent.GD.requestor import GDRequestor\n"
+        "started = time.perf_counter()\n"
+        "GDRequestor()"
+    ),
+    "import api": "import api.main",
+}
+
+# Settings of the benchmark must not be overridden by the local .env file.
+TEMPLATE = """
+import time
+import dotenv
+dotenv.load_dotenv = lambda *args, **kwargs: False
+started = time.perf_counter()
+{code}
+print(time.perf_counter() - started)
+"""
+
+
+def make_service_account(path: Path, token_uri: str = "https://oauth2.googleapis.com/token") -> Path:
+    """Writes service account credentials file with a new private key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    path.write_text(
+        json.dumps(
+            {
+                "type": "service_account",
+                "project_id": "benchmark",
+                "private_key_id": "0",
+                "private_key": pem,
+                "client_email": "benchmark@benchmark.iam.gserviceaccount.com",
+                "client_id": "0",
+                "token_uri": token_uri,
+            }
+        ),
+        encoding="utf-8",
+    )
+    return path
+
+
+def measure(code: str, env: dict) -> float:
+    """Runs the code in a new interpreter and returns its wall time in seconds."""
+    result = subprocess.run(
+        [sys.executable, "-c", TEMPLATE.format(code=code)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main(repeats: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(Path(__file__).resolve().parent.parent),
+            "GD_CREDENTIALS_FILE": str(make_service_account(tmp / "credentials.json")),
+            "AUTH_DATA_DIR": str(tmp),
+            "CACHE_DIR": str(tmp),
+            "PYTHONWARNINGS": "ignore",
+        }
+        for name, code in STEPS.items():
+            times = [measure(code, env) for _ in range(repeats)]
+            print(f"{name:>16}: median {statistics.median(times) * 1000:.0f} ms, min {min(times) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
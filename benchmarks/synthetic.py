@@ -0,0 +1,100 @@
+"""
+Generators of synthetic excel workbooks for benchmarks.
+"""
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+CATEGORIES = ["Продажи", "Закупки", "Логистика", "Маркетинг", "Склад"]
+CITIES = ["Москва", "Казань", "Новосибирск", "Екатеринбург", "Самара", "Омск"]
+
+
+def make_row(index: int, rnd: random.Random, extra_columns: int = 0) -> list:
+    """
+    Makes one row of synthetic data with mixed dtypes.
+
+    Args:
+        index (int): row index.
+        rnd (random.Random): random generator.
+        extra_columns (int): count of additional numeric columns for wide sheets.
+
+    Returns:
+        list: row values.
+    """
+    row = [
+        index,
+        f"Клиент {rnd.randint(1, 50_000)}",
+        rnd.choice(CATEGORIES),
+        rnd.choice(CITIES),
+        round(rnd.uniform(10, 100_000), 2),
+        datetime(2024, 1, 1) + timedelta(days=rnd.randint(0, 600)),
+        f"https://example.com/orders/{index}",
+    ]
+    row.extend(rnd.randint(0, 1000) for _ in range(extra_columns))
+    return row
+
+
+def make_workbook(
+    path: Path, rows: int, extra_columns: int = 0, sheets: int = 1, seed: int = 0
+) -> Path:
+    """
+    Writes a synthetic excel workbook.
+
+    Args:
+        path (Path): path to result file.
+        rows (int): count of data rows on each sheet.
+        extra_columns (int): count of additional numeric columns for wide sheets.
+        sheets (int): count of sheets.
+        seed (int): random seed.
+
+    Returns:
+        Path: path to written file.
+    """
+    rnd = random.Random(seed)
+    header = ["id", "client", "category", "city", "amount", "date", "url"]
+    header.extend(f"metric_{i}" for i in range(extra_columns))
+
+    wb = Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        ws = wb.create_sheet(f"Sheet{sheet_index + 1}")
+        ws.append(header)
+        for index in range(rows):
+            ws.append(make_row(index, rnd, extra_columns))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path
+
+
+def make_dataframe(rows: int, extra_columns: int = 0, seed: int = 0) -> pd.DataFrame:
+    """
+    Makes a synthetic sheet dataframe with the same columns as `make_workbook`.
+
+    Data is generated vectorized, so it is suitable for millions of rows.
+
+    Args:
+        rows (int): count of rows.
+        extra_columns (int): count of additional numeric columns for wide sheets.
+        seed (int): random seed.
+
+    Returns:
+        pd.DataFrame: sheet data.
+    """
+    rng = np.random.default_rng(seed)
+    index = np.arange(rows)
+    data = {
+        "id": index,
+        "client": pd.Series(rng.integers(1, 50_000, rows)).map("Клиент {}".format),
+        "category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)],
+        "city": np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), rows)],
+        "amount": rng.uniform(10, 100_000, rows).round(2),
+        "date": pd.Timestamp(2024, 1, 1) + pd.to_timedelta(rng.integers(0, 600, rows), unit="D"),
+        "url": pd.Series(index).map("https://example.com/orders/{}".format),
+    }
+    for i in range(extra_columns):
+        data[f"metric_{i}"] = rng.integers(0, 1000, rows)
+    return pd.DataFrame(data)
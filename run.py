@@ -48,4 +48,6 @@ async def main():
     await run_api()
 
 
-asyncio.run(main())
+# Worker processes of the excel executor import this module, so it runs only as a script.
+if __name__ == "__main__":
+    asyncio.run(main())
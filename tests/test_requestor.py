@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from agent.exceptions import GoogleDriveError
+from agent.GD import client as client_module
+from agent.GD import requestor as requestor_module
+from agent.GD.requestor import GDRequestor
+from benchmarks.fake_drive import FakeDrive, FakeFile
+from benchmarks.startup import make_service_account
+from benchmarks.synthetic import make_workbook
+
+
+async def no_backoff(attempt: int) -> None:
+    pass
+
+
+@pytest.fixture
+def drive(tmp_path):
+    path = make_workbook(tmp_path / "report.xlsx", 2000)
+    server = FakeDrive([FakeFile("file1", "report.xlsx", path)]).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    return cache_dir
+
+
+@pytest.fixture
+def requestor(drive, cache_dir, tmp_path, monkeypatch):
+    """GDRequestor of the fake drive with its own cache directory."""
+    credentials = make_service_account(tmp_path / "credentials.json", f"{drive.url}/token")
+    monkeypatch.setattr(GDRequestor, "_instance", None)
+    monkeypatch.setattr(requestor_module, "GD_CREDENTIALS_FILE", credentials)
+    monkeypatch.setattr(requestor_module, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(requestor_module, "backoff", no_backoff)
+    monkeypatch.setattr(client_module, "DRIVE_API_ENDPOINT", drive.url)
+    return GDRequestor()
+
+
+def download(requestor: GDRequestor):
+    return asyncio.run(requestor.download_file("file1"))
+
+
+def test_dropped_connection_resumes_from_the_received_byte(drive, requestor):
+    drive.drops = 1
+
+    path = download(requestor)
+
+    content = drive.files["file1"].content
+    assert path.read_bytes() == content
+    end = len(content) - 1
+    assert drive.media_ranges == [f"bytes=0-{end}", f"bytes={len(content) // 2}-{end}"]
+
+
+def test_parallel_parts_are_assembled(drive, requestor, monkeypatch):
+    monkeypatch.setattr(requestor_module, "DRIVE_PARALLEL_THRESHOLD", 0)
+    monkeypatch.setattr(requestor_module, "DRIVE_PARALLEL_PARTS", 4)
+    drive.drops = 2
+
+    path = download(requestor)
+
+    assert path.read_bytes() == drive.files["file1"].content
+    # 4 parts and 2 resumed parts.
+    assert len(drive.media_ranges) == 6
+
+
+def test_server_without_ranges_is_read_by_one_stream(drive, requestor, monkeypatch):
+    monkeypatch.setattr(requestor_module, "DRIVE_PARALLEL_THRESHOLD", 0)
+    drive.ranges = False
+
+    path = download(requestor)
+
+    assert path.read_bytes() == drive.files["file1"].content
+    assert drive.media_ranges[-1] is None
+
+
+def test_failed_download_leaves_no_files(drive, requestor, cache_dir, monkeypatch):
+    monkeypatch.setattr(requestor_module, "DRIVE_DOWNLOAD_RETRIES", 1)
+    # Retries are counted from the last received byte, every response is cut until nothing is sent.
+    drive.drops = 100
+
+    with pytest.raises(GoogleDriveError):
+        download(requestor)
+
+    assert not list(cache_dir.glob("file1*"))
+
+
+def test_file_appears_only_when_complete(drive, requestor, cache_dir, monkeypatch):
+    seen = []
+    replace = requestor_module.os.replace
+
+    def checked_replace(source, target):
+        seen.append((source.endswith(".part"), target.exists()))
+        replace(source, target)
+
+    monkeypatch.setattr(requestor_module.os, "replace", checked_replace)
+    drive.drops = 1
+
+    path = download(requestor)
+
+    # The temporary file is moved to the cache path in one step after all bytes are written.
+    assert seen == [(True, False)]
+    assert path.read_bytes() == drive.files["file1"].content
+    assert not list(cache_dir.glob("*.part"))
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from openpyxl import load_workbook
+
+from agent.excel import executor
+from agent.excel.excel_reader import ExcelReader
+from agent.excel.sheets import SheetsWorkbook
+from agent.GD.client import DriveClient
+from agent.GD.sheets import SheetValues
+from benchmarks.fake_drive import XLSX_MIME_TYPE, FakeDrive, FakeFile
+from benchmarks.synthetic import make_workbook
+
+ROWS = 30
+
+
+@pytest.fixture
+def drive(tmp_path):
+    path = make_workbook(tmp_path / "report.xlsx", ROWS, sheets=2)
+    server = FakeDrive([FakeFile("sheet1", "report", path, native=True)]).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def open_sheets(drive, tmp_path):
+    """Opens the native file of the fake drive as SheetsWorkbook, like GDRequestor does."""
+    executor.configure("thread")
+
+    async def open_sheets() -> SheetsWorkbook:
+        client = DriveClient(AnonymousCredentials(), api_endpoint=drive.url)
+        values = SheetValues(client, api_endpoint=drive.url)
+        stub_path = tmp_path / "sheet1.gsheet"
+        stub = {"id": "sheet1", "revision": "r1", "sheets": await values.get_sheets("sheet1")}
+        stub_path.write_text(json.dumps(stub), encoding="utf-8")
+
+        async def export(file_id: str):
+            file_path = tmp_path / f"{file_id}.xlsx"
+            async with client.stream(
+                f"/drive/v3/files/{file_id}/export", params={"mimeType": XLSX_MIME_TYPE}
+            ) as response:
+                file_path.write_bytes(await response.aread())
+            return file_path
+
+        return SheetsWorkbook(stub_path, values.get, export)
+
+    return open_sheets
+
+
+def source_rows(drive) -> list[tuple]:
+    book = load_workbook(drive.files["sheet1"].path, read_only=True)
+    rows = [row[:2] for row in book["Sheet1"].iter_rows(values_only=True)]
+    book.close()
+    return rows
+
+
+def test_read_range_pads_cells_out_of_data(drive, open_sheets):
+    async def run():
+        workbook = await open_sheets()
+        return await workbook.read_range("Sheet1", 1, ROWS, 2, ROWS + 3)
+
+    rows = asyncio.run(run())
+
+    assert rows[:2] == source_rows(drive)[ROWS - 1 :]
+    assert rows[2:] == [(None, None)] * 2
+
+
+def test_preview_row_count_is_unknown_until_export(drive, open_sheets):
+    async def run():
+        workbook = await open_sheets()
+        reader = ExcelReader("report", str(workbook.file_path), workbook=workbook)
+        before = await reader.get_sheet_preview("Sheet1")
+        await reader.search_data("Sheet1", "client")
+        after = await reader.get_sheet_preview("Sheet1")
+        return before, after
+
+    before, after = asyncio.run(run())
+
+    # The grid of the fake sheet is 1000 rows, much more than the data.
+    assert before["row_count"] is None
+    assert before["max_row_count"] == 999
+    assert before["columns"][:2] == ["id", "client"]
+    assert [row[:2] for row in before["preview_rows"]] == [
+        list(row) for row in source_rows(drive)[1:6]
+    ]
+    assert after["row_count"] == ROWS
+
+
+def test_concurrent_opens_export_once(drive, open_sheets):
+    async def run():
+        workbook = await open_sheets()
+        return await asyncio.gather(*(workbook.open() for _ in range(5)))
+
+    workbooks = asyncio.run(run())
+
+    assert all(workbook is workbooks[0] for workbook in workbooks)
+    assert drive.requests["files.export"] == 1